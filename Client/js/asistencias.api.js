@@ -6,14 +6,17 @@
  *   usando SimDB y retornando Promesas para simular llamadas a un backend.
  *
  * Métodos principales:
- * - listRegistros({rol?, estado?, search?}) -> Promise<Registro[]>
+ * - listRegistros({rol?, estado?, search?, desde?, hasta?, aula_id?, grupo?, cursor?, limite?}) -> Promise<Registro[]>
+ * - listRegistrosPagina({...}) -> Promise<{asistencias, has_more, siguiente_cursor}>
  * - createRegistro(reg) -> Promise<Registro>
  * - updateRegistro(id, patch) -> Promise<Registro>
  * - listJustificantes() -> Promise<Justificante[]>
  * - getJustificante(id) -> Promise<Justificante|null>
  * - createJustificante(just) -> Promise<Justificante>
  * - deleteJustificante(id) -> Promise<{ok:true}>
- * - makeCSVAll()/makeCSVEst()/makeCSVDoc() -> string CSV
+ * - makeCSVAll()/makeCSVEst()/makeCSVDoc() -> string CSV (vía /asistencias/export)
+ * - urlExportCSV({rol?, ...}) -> URL de descarga directa (el navegador guarda el stream sin pasarlo a memoria)
+ * - escucharEventos(onEvento, {aula_id?, grupo?}) -> EventSource (/api/eventos)
  *
  * Notas:
  * - Al crear un justificante con regId, se actualiza el estado del registro a "Justificado".
@@ -24,27 +27,29 @@
   const API_URL = "http://localhost:8000/api";
   const API_URL_QR = "http://10.92.255.218:8000/api/asistencias/qr";  // Cambia por tu IP real
 
-  // Función para convertir registros a CSV
-  function csvString(rows, keys){
-    return [keys.join(',')].concat(
-      rows.map(r => keys.map(k => `"${(((r[k]||'')+'').toString()).replace(/"/g,'""')}"`).join(','))
-    ).join('\n');
-  }
-
   // API para consumir el backend real
   window.AsistenciasAPI = {
-    // Listar asistencias con JOIN
-    async listRegistros({rol, estado, search}={}) {
-      const res = await fetch(`${API_URL}/asistencias`);
-      const data = await res.json();
-      let regs = data.asistencias || [];
-      if (rol) regs = regs.filter(r => r.rol === rol);
-      if (estado) regs = regs.filter(r => r.estado === estado);
-      if (search) {
-        const s = search.toLowerCase();
-        regs = regs.filter(r => (r.nombre||'').toLowerCase().includes(s) || (r.cedula||'').toLowerCase().includes(s));
-      }
-      return regs;
+    // Listar asistencias con JOIN (filtros y paginación se resuelven en el servidor)
+    async listRegistros({rol, estado, search, desde, hasta, aula_id, grupo, cursor, limite}={}) {
+      const data = await this.listRegistrosPagina({rol, estado, search, desde, hasta, aula_id, grupo, cursor, limite});
+      return data.asistencias || [];
+    },
+
+    // Devuelve la página completa: {asistencias, has_more, siguiente_cursor}
+    async listRegistrosPagina({rol, estado, search, desde, hasta, aula_id, grupo, cursor, limite}={}) {
+      const params = new URLSearchParams();
+      if (rol) params.set('rol', rol);
+      if (estado) params.set('estado', estado);
+      if (search) params.set('buscar', search);
+      if (desde) params.set('desde', desde);
+      if (hasta) params.set('hasta', hasta);
+      if (aula_id) params.set('aula_id', aula_id);
+      if (grupo) params.set('grupo', grupo);
+      if (cursor) params.set('cursor', cursor);
+      if (limite) params.set('limite', limite);
+      const res = await fetch(`${API_URL}/asistencias?${params}`);
+      if (!res.ok) throw new Error("Error al listar asistencias");
+      return await res.json();
     },
 
     // Actualizar estado de asistencia
@@ -83,6 +88,26 @@
       return await res.json();
     },
 
+    // Justificar todas las ausencias/tardanzas de un usuario en un rango de fechas (una sola petición)
+    async createJustificantesRango({ usuario_id, desde, hasta, motivo, fecha_documento, referencia }) {
+      const res = await fetch(`${API_URL}/justificantes/lote`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ usuario_id, desde, hasta, motivo, fecha_documento, referencia })
+      });
+      if (!res.ok) throw new Error("No se pudieron crear los justificantes");
+      return await res.json();
+    },
+
+    // Adjuntar archivo (PDF o imagen) a un justificante: multipart, el servidor lo guarda por bloques
+    async uploadArchivoJustificante(id, file) {
+      const form = new FormData();
+      form.append("archivo", file);
+      const res = await fetch(`${API_URL}/justificantes/${id}/archivo`, { method: "POST", body: form });
+      if (!res.ok) throw new Error("No se pudo subir el archivo");
+      return await res.json();
+    },
+
     // Eliminar justificante por ID
     async deleteJustificante(id) {
       const res = await fetch(`${API_URL}/justificantes/${id}`, { method: "DELETE" });
@@ -99,21 +124,38 @@
       return await res.json();
     },
 
-    // Exportar CSV usando los datos del backend
+    // URL del CSV generado en streaming por el backend (/asistencias/export, Content-Disposition: attachment)
+    urlExportCSV(params={}) {
+      const qs = new URLSearchParams({formato: 'csv', ...params});
+      return `${API_URL}/asistencias/export?${qs}`;
+    },
+
+    // Exportar CSV como texto (lo lee completo en memoria; para descargar usar urlExportCSV)
+    async exportCSV(params={}) {
+      const res = await fetch(this.urlExportCSV(params));
+      if (!res.ok) throw new Error("No se pudo exportar");
+      return await res.text();
+    },
     async makeCSVAll() {
-      const regs = await this.listRegistros();
-      const keys=['nombre','cedula','rol','grupo','aula_id','tipo','fecha','hora','estado'];
-      return csvString(regs, keys);
+      return this.exportCSV();
     },
     async makeCSVEst() {
-      const regs = await this.listRegistros({rol:'Estudiante'});
-      const keys=['nombre','cedula','grupo','aula_id','tipo','fecha','hora','estado'];
-      return csvString(regs, keys);
+      return this.exportCSV({rol:'Estudiante'});
     },
     async makeCSVDoc() {
-      const regs = await this.listRegistros({rol:'Docente'});
-      const keys=['nombre','cedula','aula_id','tipo','fecha','hora','estado'];
-      return csvString(regs, keys);
+      return this.exportCSV({rol:'Docente'});
+    },
+
+    // Escuchar eventos en vivo (SSE): onEvento(evento) por cada asistencia/estado/justificante/ausentes
+    escucharEventos(onEvento, {aula_id, grupo}={}) {
+      const params = new URLSearchParams();
+      if (aula_id) params.set('aula_id', aula_id);
+      if (grupo) params.set('grupo', grupo);
+      const es = new EventSource(`${API_URL}/eventos?${params}`);
+      ['asistencia', 'estado', 'justificante', 'ausentes'].forEach(tipo =>
+        es.addEventListener(tipo, ev => onEvento(JSON.parse(ev.data)))
+      );
+      return es;  // es.close() para dejar de escuchar
     },
 
     // Marcar asistencia por QR
@@ -13,5 +13,5 @@ export async function login(correo, password) {
   // Si la respuesta no es exitosa, lanza error
   if (!res.ok) throw new Error('Usuario o contraseña incorrectos');
   // Devuelve el objeto usuario recibido del backend
-  return await res.json(); // { user }
-}
\ No newline at end of file
+  return await res.json(); // { user, token }
+}
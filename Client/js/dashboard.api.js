@@ -2,27 +2,25 @@
  * DashboardAPI — Resumen del día
  *
  * Propósito:
- * - Calcular métricas rápidas para el dashboard a partir de los registros
- *   de asistencias guardados en SimDB.
+ * - Obtener métricas rápidas para el dashboard desde el backend
+ *   (/api/dashboard/resumen), que las lee de contadores incrementales.
  *
  * Método:
- * - resumenDelDia() -> Promise<{ total, entradas, salidas, puntualidad }>
+ * - resumenDelDia({fecha?, aula_id?, rol?}) -> Promise<{ total, entradas, salidas, puntualidad, detalle }>
  *   donde puntualidad es el % de entradas con estado "A tiempo".
  */
 (function(){
-  const db = window.SimDB, api = window.SimAPI;
+  const API_URL = "http://localhost:8000/api";
 
   window.DashboardAPI = {
-    async resumenDelDia(){
-      await api.delay();
-      const asistencias = db.getRegs();
-      const hoy = new Date().toISOString().slice(0,10);
-      const registrosHoy = asistencias.filter(a=>a.fecha===hoy);
-      const entradas = registrosHoy.filter(a=>a.tipo==='Entrada');
-      const salidas = registrosHoy.filter(a=>a.tipo==='Salida');
-      const entradasPuntuales = entradas.filter(a=>a.estado==='A tiempo');
-      const porcentajePuntual = entradas.length>0 ? Math.round((entradasPuntuales.length/entradas.length)*100) : 0;
-      return { total: registrosHoy.length, entradas: entradas.length, salidas: salidas.length, puntualidad: porcentajePuntual };
+    async resumenDelDia({fecha, aula_id, rol}={}){
+      const params = new URLSearchParams();
+      if (fecha) params.set('fecha', fecha);
+      if (aula_id) params.set('aula_id', aula_id);
+      if (rol) params.set('rol', rol);
+      const res = await fetch(`${API_URL}/dashboard/resumen?${params}`);
+      if (!res.ok) throw new Error("Error al obtener el resumen del día");
+      return await res.json();
     }
   };
-})();
\ No newline at end of file
+})();
@@ -0,0 +1,146 @@
+"""
+Archivado de periodos cerrados: mueve asistencias (y sus justificantes) anteriores
+a una fecha de corte a `asistencias_archivo` / `justificantes_archivo`.
+
+La tabla activa queda pequeña (índices y búferes con los datos del periodo en curso)
+sin perder historial. Se mueve por lotes de ARCHIVADO_LOTE filas, cada uno en su
+propia transacción corta, en lugar de un DELETE que bloquee la tabla entera.
+Los contadores y la tabla de resumen no se tocan: los reportes siguen cubriendo
+todo el historial.
+
+Se eligió una tabla de archivo y no PARTITION BY RANGE de MySQL porque las tablas
+particionadas de InnoDB no admiten claves foráneas (justificantes -> asistencias)
+y exigirían incluir `fecha` en la clave primaria y en la clave única.
+
+Uso desde PROYECTOSOF8/Server/:
+
+    py archivado.py 2025-07-01     (archiva todo lo anterior al 1 de julio)
+"""
+import os
+import threading
+import time
+from datetime import date, datetime
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+import models
+
+ARCHIVADO_LOTE = int(os.getenv("ARCHIVADO_LOTE", "2000"))
+ARCHIVADO_PAUSA_MS = float(os.getenv("ARCHIVADO_PAUSA_MS", "50"))  # respiro para el tráfico normal entre lotes
+
+
+def corte_valido(hasta):
+    """El corte es un inicio de mes y no puede incluir el mes en curso."""
+    return hasta.day == 1 and hasta <= date.today().replace(day=1)
+
+
+def incluir_archivo(db: Session, desde, hasta=None):
+    """¿La consulta pide fechas que ya están archivadas? Solo si trae `desde` o `hasta` (una sonda por índice)."""
+    if desde is None and hasta is None:
+        return False
+    AA = models.AsistenciaArchivo
+    q = db.query(AA.id)
+    if desde is not None:
+        q = q.filter(AA.fecha >= desde)
+    if hasta is not None:
+        q = q.filter(AA.fecha <= hasta)
+    return q.first() is not None
+
+
+def _mover(db: Session, origen, destino, condicion):
+    columnas = [c.name for c in destino.__table__.columns]
+    tabla = origen.__table__
+    return db.execute(
+        insert(destino).from_select(columnas, select(*[tabla.c[c] for c in columnas]).where(condicion))
+    ).rowcount
+
+
+def archivar_lote(db: Session, hasta, limite=ARCHIVADO_LOTE):
+    """Mueve hasta `limite` asistencias con fecha < hasta; devuelve (asistencias, justificantes). Sin commit."""
+    A, J = models.Asistencia, models.Justificante
+    ids = [i for i, in db.query(A.id).filter(A.fecha < hasta).order_by(A.id).limit(limite)]
+    if not ids:
+        return 0, 0
+    _mover(db, A, models.AsistenciaArchivo, A.id.in_(ids))
+    justificantes = _mover(db, J, models.JustificanteArchivo, J.asistencia_id.in_(ids))
+    db.query(J).filter(J.asistencia_id.in_(ids)).delete(synchronize_session=False)
+    db.query(A).filter(A.id.in_(ids)).delete(synchronize_session=False)
+    return len(ids), justificantes
+
+
+class Archivador:
+    """Un archivado a la vez, con progreso consultable mientras corre."""
+
+    def __init__(self, fabrica_sesion, al_confirmar=None):
+        """al_confirmar(db): se llama tras el commit de cada lote (p. ej. invalidar ETags)."""
+        self.fabrica_sesion = fabrica_sesion
+        self.al_confirmar = al_confirmar
+        self._lock = threading.Lock()
+        self.progreso = {"en_curso": False}
+
+    def iniciar(self, hasta):
+        """Reserva el archivador para `hasta`; False si ya hay uno en curso."""
+        with self._lock:
+            if self.progreso["en_curso"]:
+                return False
+            self.progreso = {"en_curso": True, "hasta": str(hasta), "total": None, "movidas": 0,
+                             "justificantes": 0, "lotes": 0, "inicio": datetime.now().isoformat(timespec="seconds")}
+            return True
+
+    def ejecutar(self, hasta):
+        inicio = time.perf_counter()
+        p = self.progreso
+        try:
+            db = self.fabrica_sesion()
+            try:
+                p["total"] = db.query(models.Asistencia.id).filter(models.Asistencia.fecha < hasta).count()
+            finally:
+                db.close()
+            while True:
+                db = self.fabrica_sesion()
+                try:
+                    movidas, justificantes = archivar_lote(db, hasta)
+                    if not movidas:
+                        break
+                    db.commit()
+                    if self.al_confirmar is not None:
+                        self.al_confirmar(db)
+                finally:
+                    db.close()
+                p["movidas"] += movidas
+                p["justificantes"] += justificantes
+                p["lotes"] += 1
+                p["porcentaje"] = round(p["movidas"] * 100 / p["total"], 1) if p["total"] else 100.0
+                p["segundos"] = round(time.perf_counter() - inicio, 1)
+                time.sleep(ARCHIVADO_PAUSA_MS / 1000)
+            p["ok"] = True
+        except Exception as e:
+            p["ok"] = False
+            p["error"] = str(e)
+        p["segundos"] = round(time.perf_counter() - inicio, 1)
+        p["terminado"] = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            p["en_curso"] = False
+        return p
+
+    def estado(self):
+        return dict(self.progreso)
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal, Base, engine
+
+    parser = argparse.ArgumentParser(description="Archiva las asistencias anteriores a una fecha de corte")
+    parser.add_argument("hasta", type=date.fromisoformat, help="primer día del mes que queda en la tabla activa")
+    args = parser.parse_args()
+    if not corte_valido(args.hasta):
+        parser.error("el corte debe ser el día 1 de un mes anterior o igual al actual")
+
+    Base.metadata.create_all(bind=engine)
+    archivador = Archivador(SessionLocal)
+    archivador.iniciar(args.hasta)
+    r = archivador.ejecutar(args.hasta)
+    if not r.get("ok"):
+        raise SystemExit(f"❌ {r.get('error')}")
+    print(f"✅ {r['movidas']} asistencias y {r['justificantes']} justificantes archivados "
+          f"en {r['lotes']} lotes ({r['segundos']}s)")
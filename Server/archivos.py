@@ -0,0 +1,81 @@
+"""
+Almacenamiento de archivos de justificantes direccionado por contenido.
+
+Cada archivo se guarda una sola vez bajo su SHA-256 (archivos/ab/abcdef...), así
+el mismo certificado subido para varias asistencias ocupa espacio una vez. La
+subida se copia por bloques a un temporal mientras se calcula el hash y luego se
+renombra: la memoria usada no depende del tamaño del archivo.
+"""
+import hashlib
+import os
+from uuid import uuid4
+
+ARCHIVOS_DIR = os.getenv("ARCHIVOS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archivos"))
+ARCHIVO_MAX_MB = float(os.getenv("ARCHIVO_MAX_MB", "15"))
+BLOQUE = 256 * 1024  # bytes por lectura/escritura
+
+# Lista exacta: un prefijo "image/" dejaría pasar image/svg+xml, que el navegador
+# ejecuta como documento (con sus scripts) si se sirve inline
+TIPOS_PERMITIDOS = ("application/pdf", "image/png", "image/jpeg")
+
+
+class ArchivoDemasiadoGrande(Exception):
+    pass
+
+
+class AlmacenArchivos:
+    def __init__(self, raiz=ARCHIVOS_DIR, max_bytes=int(ARCHIVO_MAX_MB * 1024 * 1024)):
+        self.raiz = raiz
+        self.max_bytes = max_bytes
+
+    def ruta(self, sha256):
+        return os.path.join(self.raiz, sha256[:2], sha256)
+
+    def existe(self, sha256):
+        return os.path.exists(self.ruta(sha256))
+
+    def guardar(self, origen):
+        """
+        Copia `origen` (objeto con .read(n)) por bloques; devuelve (sha256, tamaño).
+        Si el contenido ya estaba guardado, descarta la copia nueva.
+        """
+        temporales = os.path.join(self.raiz, ".tmp")
+        os.makedirs(temporales, exist_ok=True)
+        temporal = os.path.join(temporales, uuid4().hex)
+        h = hashlib.sha256()
+        tamano = 0
+        try:
+            with open(temporal, "wb") as destino:
+                while bloque := origen.read(BLOQUE):
+                    tamano += len(bloque)
+                    if tamano > self.max_bytes:
+                        raise ArchivoDemasiadoGrande()
+                    h.update(bloque)
+                    destino.write(bloque)
+            sha256 = h.hexdigest()
+            final = self.ruta(sha256)
+            if os.path.exists(final):
+                os.remove(temporal)
+            else:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.replace(temporal, final)
+            return sha256, tamano
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+    def borrar(self, sha256):
+        try:
+            os.remove(self.ruta(sha256))
+        except FileNotFoundError:
+            pass
+
+
+def tipo_base(mime):
+    """'Image/PNG; charset=x' -> 'image/png'."""
+    return (mime or "").split(";")[0].strip().lower()
+
+
+def tipo_permitido(mime):
+    return tipo_base(mime) in TIPOS_PERMITIDOS
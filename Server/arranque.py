@@ -0,0 +1,100 @@
+"""
+Arranque del servidor: verificación del esquema en caché y medición de cada fase.
+
+Antes `main.py` ejecutaba `Base.metadata.create_all` al importarse: cada worker (y
+cada recarga de --reload) reflejaba el esquema en MySQL antes de poder atender.
+Ahora el lifespan de la app la llama solo si el esquema de los modelos cambió desde
+la última verificación contra esa misma base de datos (huella en ESQUEMA_CACHE).
+
+ESQUEMA_VERIFICAR:
+- cache (por defecto): create_all solo si la huella no coincide o falta alguna tabla
+  (p. ej. la BD se borró y recreó vacía: el archivo de huella no se entera)
+- siempre: create_all en cada arranque (p. ej. tras borrar la BD a mano)
+- no: no se toca el esquema (las tablas las crea el README / migraciones)
+"""
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateTable
+
+ESQUEMA_VERIFICAR = os.getenv("ESQUEMA_VERIFICAR", "cache")
+ESQUEMA_CACHE = os.getenv("ESQUEMA_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".esquema_verificado"))
+
+_IMPORTADO = time.perf_counter()  # aproxima el inicio del proceso (se importa al principio de main.py)
+
+
+def huella_esquema(engine, metadata):
+    """Hash del DDL de todas las tablas para este dialecto y del destino (sin contraseña)."""
+    h = hashlib.sha256(engine.url.render_as_string(hide_password=True).encode())
+    for tabla in metadata.sorted_tables:
+        h.update(str(CreateTable(tabla).compile(dialect=engine.dialect)).encode())
+    return h.hexdigest()
+
+
+def verificar_esquema(engine, metadata, modo=ESQUEMA_VERIFICAR, ruta=ESQUEMA_CACHE):
+    """Crea las tablas que falten según `modo`; devuelve qué se hizo (cache, creado, omitido)."""
+    if modo == "no":
+        return "omitido"
+    huella = huella_esquema(engine, metadata)
+    if modo == "cache":
+        try:
+            with open(ruta) as f:
+                # La huella dice que el esquema no cambió; una sola consulta confirma que las tablas siguen ahí
+                if f.read().strip() == huella and set(metadata.tables) <= set(inspect(engine).get_table_names()):
+                    return "cache"
+        except FileNotFoundError:
+            pass
+    metadata.create_all(bind=engine)
+    try:
+        with open(ruta, "w") as f:
+            f.write(huella)
+    except OSError:
+        pass  # sin permiso de escritura: se verificará de nuevo en el próximo arranque
+    return "creado"
+
+
+class Arranque:
+    """Fases del arranque con su duración; `listo` habilita /api/ready."""
+
+    def __init__(self):
+        self.listo = False
+        self.error = None
+        self.fases = {}
+        self.detalle = {}
+        self.inicio = None
+        self.total_ms = None
+
+    @contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nombre] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    def comenzar(self):
+        self.listo = False
+        self.error = None
+        # La importación solo cuenta en el primer arranque del proceso
+        primero = self.inicio is None
+        self.inicio = time.perf_counter()
+        self.fases = {"importacion": round((self.inicio - _IMPORTADO) * 1000, 1) if primero else 0.0}
+
+    def terminar(self, error=None):
+        self.total_ms = round((time.perf_counter() - self.inicio) * 1000 + self.fases["importacion"], 1)
+        self.error = error
+        self.listo = error is None
+        if self.listo:
+            self.detalle["listo_desde"] = datetime.now().isoformat(timespec="seconds")
+
+    def estado(self):
+        return {
+            "listo": self.listo,
+            "error": self.error,
+            "arranque_ms": self.total_ms,
+            "fases_ms": self.fases,
+            **self.detalle,
+        }
@@ -0,0 +1,13 @@
+"""
+Benchmark reproducible de la API de asistencias.
+
+Uso (desde PROYECTOSOF8/Server/):
+
+    py -m benchmark --usuarios 2000 --dias 60 --salida bench.json
+    py -m benchmark.comparar antes.json despues.json
+
+Por defecto genera una BD SQLite temporal (asistencias_benchmark.db en el directorio
+temporal) y llama a la app en proceso (httpx + ASGI, sin red). Una DATABASE_URL de
+MySQL solo se usa con --permitir-bd-real (el benchmark borra los datos de hoy); con
+--url mide un servidor uvicorn ya levantado.
+"""
@@ -0,0 +1,172 @@
+"""
+Ejecuta el benchmark completo y guarda los resultados en JSON.
+
+    py -m benchmark [--usuarios N] [--dias N] [--rondas N] [--concurrencia N]
+                    [--url http://127.0.0.1:8000] [--salida bench.json] [--permitir-bd-real]
+
+Genera usuarios y borra las asistencias, contadores y estado de hoy: por eso usa una
+BD SQLite temporal y se niega a tocar otra (DATABASE_URL de MySQL) sin --permitir-bd-real.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+SERVER = os.path.dirname(AQUI)
+BD_LOCAL = os.path.join(tempfile.gettempdir(), "asistencias_benchmark.db")
+
+
+def argumentos():
+    p = argparse.ArgumentParser(prog="benchmark", description="Benchmark de la API de asistencias")
+    p.add_argument("--usuarios", type=int, default=2000, help="estudiantes a generar")
+    p.add_argument("--dias", type=int, default=60, help="días de historial")
+    p.add_argument("--rondas", type=int, default=3, help="repeticiones de inicio/salida de clase")
+    p.add_argument("--rafaga", type=int, default=300, help="estudiantes que escanean por ronda")
+    p.add_argument("--concurrencia", type=int, default=50)
+    p.add_argument("--sondeos", type=int, default=200, help="peticiones al dashboard y a los listados")
+    p.add_argument("--paginas", type=int, default=20, help="páginas del recorrido por cursor")
+    p.add_argument("--semilla", type=int, default=42)
+    p.add_argument("--url", help="mide un servidor ya levantado (los datos deben existir en su BD)")
+    p.add_argument("--reusar", action="store_true", help="no regenerar la BD si ya existe")
+    p.add_argument("--salida", help="archivo JSON de resultados (por defecto solo imprime)")
+    p.add_argument("--permitir-bd-real", action="store_true",
+                   help="usar la DATABASE_URL no SQLite del entorno (se borran los datos de hoy)")
+    return p.parse_args()
+
+
+def preparar_entorno(args):
+    """Configura la BD antes de importar la app (database.py lee el entorno al importarse)."""
+    urls = [os.environ[k] for k in ("DATABASE_URL", "ASYNC_DATABASE_URL") if k in os.environ]
+    if any(not url.startswith("sqlite") for url in urls) and not args.permitir_bd_real:
+        sys.exit("DATABASE_URL apunta a una BD que no es SQLite: el benchmark genera usuarios y borra "
+                 "las asistencias de hoy. Quita la variable o usa --permitir-bd-real si es una BD de pruebas.")
+    if "DATABASE_URL" not in os.environ:
+        if os.path.exists(BD_LOCAL) and not args.reusar:
+            os.remove(BD_LOCAL)
+        os.environ["DATABASE_URL"] = f"sqlite:///{BD_LOCAL}"
+        os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{BD_LOCAL}")
+    # Los ausentes se miden en salida_docente: el planificador de la app no debe adelantarse
+    os.environ.setdefault("PLANIFICADOR_SEG", "3600")
+    if os.environ["DATABASE_URL"].startswith("sqlite"):
+        from benchmark import sqlite_local
+        sqlite_local.aplicar()
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def ejecutar(args, cliente, datos, limpiar_hoy, cerrar_ventanas=None):
+    from benchmark import escenarios
+    m = defaultdict(escenarios.Medicion)
+
+    # Calentamiento: carga la caché de usuarios y abre las conexiones del pool
+    await cliente.get("/api/status")
+
+    docentes = datos["cedulas_docentes"]
+    estudiantes = datos["cedulas_estudiantes"]
+    for ronda in range(args.rondas):
+        if limpiar_hoy:
+            limpiar_hoy()
+        docente = docentes[ronda % len(docentes)]
+        inicio = (ronda * args.rafaga) % max(1, len(estudiantes) - args.rafaga)
+        await escenarios.inicio_de_clase(cliente, docente, estudiantes[inicio:inicio + args.rafaga], args.concurrencia, m)
+        await escenarios.salida_docente(cliente, docente, m, cerrar_ventanas)
+
+    await escenarios.sondeo_dashboard(cliente, args.sondeos, args.concurrencia, m)
+    await escenarios.listados(cliente, args.sondeos, args.paginas, args.concurrencia, m)
+    await escenarios.reportes(cliente, args.sondeos, args.dias, args.concurrencia, m)
+    return m
+
+
+def main():
+    args = argumentos()
+    sys.path.insert(0, SERVER)
+    preparar_entorno(args)
+
+    import httpx
+    import database
+    import models
+    from benchmark import fixtures, estadisticas
+
+    inicio = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        if args.reusar and db.query(models.Usuario).count():
+            print("Reutilizando la BD existente")
+            datos = fixtures.existentes(db)
+        else:
+            database.Base.metadata.create_all(bind=database.engine)
+            datos = fixtures.generar(db, args.usuarios, args.dias, semilla=args.semilla)
+    finally:
+        db.close()
+    print(f"Datos: {datos['estudiantes']} estudiantes, {datos['docentes']} docentes, "
+          f"{datos['asistencias']} asistencias ({time.perf_counter() - inicio:.1f}s)")
+
+    def limpiar_hoy():
+        db = database.SessionLocal()
+        try:
+            fixtures.limpiar_hoy(db)
+        finally:
+            db.close()
+
+    async def correr():
+        if args.url:
+            async with httpx.AsyncClient(base_url=args.url, timeout=60) as cliente:
+                return await ejecutar(args, cliente, datos, limpiar_hoy)
+        import main as app_main
+
+        def cerrar_ventanas():
+            db = database.SessionLocal()
+            try:
+                app_main.cerrar_ventanas_vencidas(db)
+            finally:
+                db.close()
+
+        transporte = httpx.ASGITransport(app=app_main.app)
+        # ASGITransport no envía los eventos lifespan: se ejecuta aquí (pools calientes, apagado del escritor)
+        async with app_main.app.router.lifespan_context(app_main.app):
+            async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+                return await ejecutar(args, cliente, datos, limpiar_hoy, cerrar_ventanas)
+
+    mediciones = asyncio.run(correr())
+    resultados = {
+        nombre: estadisticas.resumir(med.latencias, med.errores, med.segundos)
+        for nombre, med in mediciones.items()
+    }
+
+    informe = {
+        "meta": {
+            "commit": commit_actual(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "bd": database.engine.dialect.name,
+            "destino": args.url or "asgi",
+            "db_async": database.DB_ASYNC,
+            "escritura_grupal": os.getenv("ESCRITURA_GRUPAL", "0"),
+            "parametros": {k: v for k, v in vars(args).items() if k not in ("salida", "url")},
+        },
+        "datos": {k: datos[k] for k in ("estudiantes", "docentes", "asistencias")},
+        "resultados": resultados,
+    }
+    print(estadisticas.tabla(resultados))
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
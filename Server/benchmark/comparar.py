@@ -0,0 +1,45 @@
+"""
+Compara dos archivos de resultados del benchmark.
+
+    py -m benchmark.comparar antes.json despues.json
+"""
+import json
+import sys
+
+METRICAS = ("req_s", "p50_ms", "p95_ms", "p99_ms")
+
+
+def cargar(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def comparar(antes, despues):
+    lineas = [f"{'escenario':<26} " + " ".join(f"{m:>22}" for m in METRICAS)]
+    for nombre in sorted(set(antes["resultados"]) | set(despues["resultados"])):
+        a = antes["resultados"].get(nombre)
+        d = despues["resultados"].get(nombre)
+        if a is None or d is None:
+            lineas.append(f"{nombre:<26} {'(solo en ' + ('después' if a is None else 'antes') + ')':>22}")
+            continue
+        celdas = []
+        for m in METRICAS:
+            cambio = (d[m] - a[m]) / a[m] * 100 if a[m] else 0.0
+            celdas.append(f"{a[m]:>8} → {d[m]:<8}{cambio:+5.0f}%")
+        lineas.append(f"{nombre:<26} " + " ".join(f"{c:>22}" for c in celdas))
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        print(__doc__.strip())
+        sys.exit(2)
+    antes, despues = cargar(argv[0]), cargar(argv[1])
+    print(f"antes:   {antes['meta'].get('commit')}  ({antes['meta'].get('fecha')})")
+    print(f"después: {despues['meta'].get('commit')}  ({despues['meta'].get('fecha')})")
+    print(comparar(antes, despues))
+
+
+if __name__ == "__main__":
+    main()
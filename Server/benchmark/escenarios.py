@@ -0,0 +1,105 @@
+"""
+Escenarios de carga. Cada uno recibe el cliente httpx y devuelve
+{nombre_medicion: [latencias], ...} más el número de errores por medición.
+"""
+import asyncio
+import base64
+import time
+
+
+class Medicion:
+    def __init__(self):
+        self.latencias = []
+        self.errores = 0
+        self.segundos = 0.0
+
+    async def medir(self, peticion, esperados=(200,)):
+        inicio = time.perf_counter()
+        r = await peticion
+        self.latencias.append(time.perf_counter() - inicio)
+        if r.status_code not in esperados:
+            self.errores += 1
+        return r
+
+
+async def _en_paralelo(medicion, coros, concurrencia):
+    sem = asyncio.Semaphore(concurrencia)
+
+    async def uno(coro):
+        async with sem:
+            return await coro
+
+    inicio = time.perf_counter()
+    respuestas = await asyncio.gather(*(uno(c) for c in coros))
+    medicion.segundos += time.perf_counter() - inicio
+    return respuestas
+
+
+def _qr(cedula):
+    # Mismo formato que genera el carnet: base64 de la cédula
+    return {"qr_texto": base64.b64encode(cedula.encode()).decode()}
+
+
+async def inicio_de_clase(cliente, cedula_docente, cedulas_estudiantes, concurrencia, m):
+    """El docente abre la ventana y llega la ráfaga de estudiantes escaneando a la vez."""
+    await m["qr_docente_entrada"].medir(cliente.post("/api/asistencias/qr", json=_qr(cedula_docente)))
+    ms = m["qr_rafaga_estudiantes"]
+    await _en_paralelo(ms, [
+        ms.medir(cliente.post("/api/asistencias/qr", json=_qr(c))) for c in cedulas_estudiantes
+    ], concurrencia)
+
+
+async def salida_docente(cliente, cedula_docente, m, cerrar_ventanas=None):
+    """
+    Salida del docente: cierra la ventana. Con la app en proceso también se mide
+    `cerrar_ventanas` (main.cerrar_ventanas_vencidas), que registra los ausentes.
+    """
+    await m["qr_docente_salida"].medir(cliente.post("/api/asistencias/qr", json=_qr(cedula_docente)))
+    if cerrar_ventanas is not None:
+        ms = m["ausentes_cierre_ventana"]
+        inicio = time.perf_counter()
+        await asyncio.to_thread(cerrar_ventanas)
+        ms.latencias.append(time.perf_counter() - inicio)
+
+
+async def sondeo_dashboard(cliente, peticiones, concurrencia, m):
+    ms = m["dashboard_resumen"]
+    await _en_paralelo(ms, [ms.medir(cliente.get("/api/dashboard/resumen")) for _ in range(peticiones)], concurrencia)
+
+
+async def listados(cliente, peticiones, paginas, concurrencia, m):
+    """Primera página (la más pedida), página filtrada y recorrido completo por cursor."""
+    ms = m["listado_primera_pagina"]
+    await _en_paralelo(ms, [ms.medir(cliente.get("/api/asistencias")) for _ in range(peticiones)], concurrencia)
+
+    ms = m["listado_filtrado"]
+    await _en_paralelo(ms, [
+        ms.medir(cliente.get("/api/asistencias", params={"estado": "Tarde", "rol": "Estudiante"}))
+        for _ in range(peticiones)
+    ], concurrencia)
+
+    ms = m["listado_paginado"]
+    cursor = None
+    inicio = time.perf_counter()
+    for _ in range(paginas):
+        params = {"limite": 500}
+        if cursor:
+            params["cursor"] = cursor
+        r = await ms.medir(cliente.get("/api/asistencias", params=params))
+        datos = r.json() if r.status_code == 200 else {}
+        cursor = datos.get("siguiente_cursor")
+        if not datos.get("has_more"):
+            break
+    ms.segundos += time.perf_counter() - inicio
+
+
+async def reportes(cliente, peticiones, dias, concurrencia, m):
+    """Reporte del periodo completo por grupo y por semana (tabla de resumen)."""
+    from datetime import date, timedelta
+    desde = (date.today() - timedelta(days=dias)).isoformat()
+    for agrupar in ("grupo", "semana"):
+        ms = m[f"reporte_{agrupar}"]
+        await _en_paralelo(ms, [
+            ms.medir(cliente.get("/api/reportes/asistencia", params={"desde": desde, "agrupar": agrupar}))
+            for _ in range(peticiones)
+        ], concurrencia)
@@ -0,0 +1,36 @@
+"""Percentiles y tabla de resultados."""
+import math
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano (valores ya ordenados)."""
+    if not valores_ordenados:
+        return 0.0
+    # Rango ceil(p·n/100), en 1..n; p·n antes de dividir evita errores de coma flotante (0.95 * 20)
+    k = max(0, min(len(valores_ordenados) - 1, math.ceil(p * len(valores_ordenados) / 100) - 1))
+    return valores_ordenados[k]
+
+
+def resumir(latencias, errores, segundos):
+    """latencias en segundos -> métricas en ms y peticiones por segundo."""
+    segundos = segundos or sum(latencias)  # peticiones secuenciales sin tiempo de pared propio
+    orden = sorted(latencias)
+    n = len(orden)
+    return {
+        "peticiones": n,
+        "errores": errores,
+        "req_s": round(n / segundos, 1) if segundos > 0 else 0.0,
+        "p50_ms": round(percentil(orden, 50) * 1000, 2),
+        "p95_ms": round(percentil(orden, 95) * 1000, 2),
+        "p99_ms": round(percentil(orden, 99) * 1000, 2),
+        "max_ms": round(orden[-1] * 1000, 2) if orden else 0.0,
+    }
+
+
+def tabla(resultados):
+    columnas = ("peticiones", "errores", "req_s", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    ancho = max([len(k) for k in resultados] + [10])
+    lineas = [f"{'escenario':<{ancho}} " + " ".join(f"{c:>10}" for c in columnas)]
+    for nombre, r in resultados.items():
+        lineas.append(f"{nombre:<{ancho}} " + " ".join(f"{r[c]:>10}" for c in columnas))
+    return "\n".join(lineas)
@@ -0,0 +1,96 @@
+"""Datos de prueba: usuarios por rol y grupo, y meses de historial de asistencias."""
+import random
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import insert
+import contadores
+import models
+
+GRUPOS = [f"{n}{l}" for n in range(1, 7) for l in "ABCD"]
+
+
+def cedula(i):
+    return f"8-{100 + i // 10000}-{i % 10000 + 1}"
+
+
+def generar(db, usuarios=2000, dias=60, docentes=None, semilla=42):
+    """Crea `usuarios` estudiantes, sus docentes y `dias` de historial; devuelve un resumen."""
+    rnd = random.Random(semilla)
+    docentes = docentes or max(1, usuarios // 30)
+
+    db.execute(insert(models.Usuario), [
+        {"nombre": f"Docente {i}", "cedula": cedula(i), "rol": "Docente",
+         "grupo": None, "correo": f"docente{i}@bench.local", "password": "bench", "activo": True}
+        for i in range(docentes)
+    ] + [
+        {"nombre": f"Estudiante {i}", "cedula": cedula(docentes + i), "rol": "Estudiante",
+         "grupo": rnd.choice(GRUPOS), "correo": f"est{i}@bench.local", "password": None, "activo": True}
+        for i in range(usuarios)
+    ] + [
+        {"nombre": "Admin", "cedula": "9-999-9999", "rol": "Administrador",
+         "grupo": None, "correo": "admin@bench.local", "password": "bench", "activo": True}
+    ])
+    ids = dict(db.query(models.Usuario.cedula, models.Usuario.id))
+    ids_docentes = [ids[cedula(i)] for i in range(docentes)]
+    ids_estudiantes = [ids[cedula(docentes + i)] for i in range(usuarios)]
+
+    # Historial: días hábiles anteriores a hoy, ~85% a tiempo, ~8% tarde, resto ausente
+    filas = 0
+    lote = []
+    hoy = date.today()
+    for d in range(dias, 0, -1):
+        fecha = hoy - timedelta(days=d)
+        if fecha.weekday() >= 5:
+            continue
+        for uid in ids_docentes:
+            lote.append(_fila(uid, "Docente", "Entrada", fecha, time(7, rnd.randint(0, 10)), "A tiempo"))
+            lote.append(_fila(uid, "Docente", "Salida", fecha, time(12, rnd.randint(0, 30)), "Cumplió horario"))
+        for uid in ids_estudiantes:
+            r = rnd.random()
+            estado = "A tiempo" if r < 0.85 else "Tarde" if r < 0.93 else "Ausente"
+            lote.append(_fila(uid, "Estudiante", "Entrada", fecha, time(7, rnd.randint(0, 40)), estado))
+        if len(lote) >= 20000:
+            db.execute(insert(models.Asistencia), lote)
+            filas += len(lote)
+            lote = []
+    if lote:
+        db.execute(insert(models.Asistencia), lote)
+        filas += len(lote)
+    # El historial se carga sin pasar por la API: los contadores se recalculan de una vez
+    contadores.reconstruir(db, hoy - timedelta(days=dias), hoy)
+    db.commit()
+    return {
+        "docentes": docentes,
+        "estudiantes": usuarios,
+        "asistencias": filas,
+        "cedulas_docentes": [cedula(i) for i in range(docentes)],
+        "cedulas_estudiantes": [cedula(docentes + i) for i in range(usuarios)],
+    }
+
+
+def _fila(usuario_id, rol, tipo, fecha, hora, estado):
+    return {"usuario_id": usuario_id, "rol": rol, "tipo": tipo, "fecha": fecha, "hora": hora,
+            "estado": estado, "aula_id": None, "created_at": datetime.combine(fecha, hora)}
+
+
+def limpiar_hoy(db):
+    """Borra las asistencias, contadores y resumen de hoy para repetir una ronda de inicio de clase."""
+    hoy = date.today()
+    db.query(models.Asistencia).filter(models.Asistencia.fecha == hoy).delete(synchronize_session=False)
+    db.query(models.ContadorDiario).filter(models.ContadorDiario.fecha == hoy).delete(synchronize_session=False)
+    db.query(models.ResumenAsistencia).filter(models.ResumenAsistencia.fecha == hoy).delete(synchronize_session=False)
+    db.query(models.EstadoCompartido).delete(synchronize_session=False)
+    db.commit()
+
+
+def existentes(db):
+    """Resumen de una BD ya generada (py -m benchmark --reusar)."""
+    filas = db.query(models.Usuario.cedula, models.Usuario.rol).order_by(models.Usuario.id).all()
+    docentes = [c for c, rol in filas if rol == "Docente"]
+    estudiantes = [c for c, rol in filas if rol == "Estudiante"]
+    return {
+        "docentes": len(docentes),
+        "estudiantes": len(estudiantes),
+        "asistencias": db.query(models.Asistencia).count(),
+        "cedulas_docentes": docentes,
+        "cedulas_estudiantes": estudiantes,
+    }
@@ -0,0 +1,29 @@
+"""
+Ajustes para usar SQLite como sustituto local de MySQL.
+
+La app guarda fechas y horas como texto ISO ("2025-03-10", "07:05:00"), que MySQL
+convierte solo; el dialecto SQLite de SQLAlchemy exige objetos date/time. Este módulo
+convierte esos textos al enlazar parámetros, sin tocar el código de la app.
+"""
+import datetime as dt
+from sqlalchemy.dialects.sqlite import base as sqlite_base
+
+_CONVERSORES = (
+    (sqlite_base.DATE, dt.date.fromisoformat),
+    (sqlite_base.TIME, dt.time.fromisoformat),
+    (sqlite_base.DATETIME, dt.datetime.fromisoformat),
+)
+
+
+def aplicar():
+    for tipo, convertir in _CONVERSORES:
+        if getattr(tipo, "_bench_iso", False):
+            continue
+        original = tipo.bind_processor
+
+        def bind_processor(self, dialect, original=original, convertir=convertir):
+            procesar = original(self, dialect)
+            return lambda v: procesar(convertir(v) if isinstance(v, str) else v)
+
+        tipo.bind_processor = bind_processor
+        tipo._bench_iso = True
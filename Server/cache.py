@@ -0,0 +1,75 @@
+"""
+Caché en memoria, acotada (LRU) y con caducidad (TTL), para búsquedas calientes.
+
+Es por proceso: con varios workers cada uno tiene la suya, por eso el TTL limita
+cuánto puede quedar desactualizada si la invalidación ocurre en otro proceso.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_NO_ENCONTRADO = object()
+
+
+class CacheLRU:
+    def __init__(self, maximo=1024, ttl=300):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.desalojados = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave, defecto=None):
+        """Devuelve el valor en caché o `defecto` si no está o ya caducó."""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave, _NO_ENCONTRADO)
+            if entrada is _NO_ENCONTRADO:
+                self.fallos += 1
+                return defecto
+            expira, valor = entrada
+            if expira < ahora:
+                del self._datos[clave]
+                self.expirados += 1
+                self.fallos += 1
+                return defecto
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+                self.desalojados += 1
+
+    def invalidar(self, *claves):
+        with self._lock:
+            for clave in claves:
+                if self._datos.pop(clave, None) is not None:
+                    self.invalidaciones += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "tamano": len(self._datos),
+                "maximo": self.maximo,
+                "ttl_segundos": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+                "expirados": self.expirados,
+                "desalojados": self.desalojados,
+                "invalidaciones": self.invalidaciones,
+            }
@@ -0,0 +1,202 @@
+"""
+Contadores incrementales para el resumen del dashboard y los reportes.
+
+Cada escritura de asistencia suma (o resta), dentro de la misma transacción, en:
+- `contadores_diarios` (fecha, aula_id, rol): resumen del día del dashboard.
+- `asistencias_resumen` (fecha, aula_id, grupo, rol, estado): reportes por
+  periodo, grupo o aula.
+Así ninguno de los dos recorre la tabla `asistencias`. Si se desalinean (cargas
+manuales, cambios de grupo), se recalculan con:
+
+    py contadores.py reconstruir 2025-01-01 2025-06-30
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import case, func, insert, select, union_all
+from sqlalchemy.orm import Session
+import models
+from database import upsert
+
+SIN_AULA = 0   # la clave primaria no admite NULL, las asistencias sin aula van aquí
+SIN_GRUPO = ""
+
+_tabla = models.ContadorDiario.__table__
+_resumen = models.ResumenAsistencia.__table__
+
+
+def _upsert(db: Session, fecha, aula_id, rol, incrementos: dict):
+    """Suma los incrementos en la fila (fecha, aula_id, rol), creándola si no existe."""
+    incrementos = {k: v for k, v in incrementos.items() if v}
+    if not incrementos:
+        return
+    valores = {"fecha": fecha, "aula_id": aula_id if aula_id is not None else SIN_AULA, "rol": rol}
+    upsert(db, _tabla, {**valores, **incrementos},
+           {k: _tabla.c[k] + v for k, v in incrementos.items()})
+
+
+def _sumar_resumen(db: Session, fecha, aula_id, grupo, rol, estado, n):
+    if not n:
+        return
+    upsert(db, _resumen, {
+        "fecha": fecha, "aula_id": aula_id if aula_id is not None else SIN_AULA,
+        "grupo": grupo or SIN_GRUPO, "rol": rol, "estado": estado, "cantidad": n
+    }, {"cantidad": _resumen.c.cantidad + n})
+
+
+def registrar(db: Session, fecha, aula_id, rol, tipo, estado, n=1, grupo=None):
+    """Suma `n` asistencias nuevas del mismo tipo/estado (y grupo del usuario)."""
+    _upsert(db, fecha, aula_id, rol, {
+        "entradas": n if tipo == "Entrada" else 0,
+        "salidas": n if tipo == "Salida" else 0,
+        "a_tiempo": n if tipo == "Entrada" and estado == "A tiempo" else 0,
+    })
+    _sumar_resumen(db, fecha, aula_id, grupo, rol, estado, n)
+
+
+def cambiar_estado(db: Session, fecha, aula_id, rol, tipo, anterior, nuevo, grupo=None, n=1):
+    """Mueve `n` asistencias de estado; ajusta la puntualidad si una entrada pasa de/a "A tiempo"."""
+    if anterior == nuevo:
+        return
+    _sumar_resumen(db, fecha, aula_id, grupo, rol, anterior, -n)
+    _sumar_resumen(db, fecha, aula_id, grupo, rol, nuevo, n)
+    if tipo == "Entrada":
+        delta = ((nuevo == "A tiempo") - (anterior == "A tiempo")) * n
+        _upsert(db, fecha, aula_id, rol, {"a_tiempo": delta})
+
+
+def resumen(db: Session, fecha, aula_id=None, rol=None):
+    """Lee los contadores de una fecha; coste proporcional a aulas x roles, no al historial."""
+    q = db.query(models.ContadorDiario).filter(models.ContadorDiario.fecha == fecha)
+    if aula_id is not None:
+        q = q.filter(models.ContadorDiario.aula_id == aula_id)
+    if rol:
+        q = q.filter(models.ContadorDiario.rol == rol)
+    filas = q.all()
+    entradas = sum(f.entradas for f in filas)
+    salidas = sum(f.salidas for f in filas)
+    a_tiempo = sum(f.a_tiempo for f in filas)
+    return {
+        "fecha": str(fecha),
+        "total": entradas + salidas,
+        "entradas": entradas,
+        "salidas": salidas,
+        "a_tiempo": a_tiempo,
+        "puntualidad": round(a_tiempo * 100 / entradas) if entradas else 0,
+        "detalle": [
+            {
+                "aula_id": f.aula_id if f.aula_id != SIN_AULA else None,
+                "rol": f.rol,
+                "entradas": f.entradas,
+                "salidas": f.salidas,
+                "a_tiempo": f.a_tiempo,
+            }
+            for f in filas
+        ],
+    }
+
+
+AGRUPACIONES = ("fecha", "semana", "grupo", "aula", "rol")
+
+
+def reporte(db: Session, desde, hasta, agrupar="grupo", rol=None, grupo=None, aula_id=None):
+    """
+    Asistencia y puntualidad por periodo, grupo, aula o rol, leyendo solo `asistencias_resumen`
+    (una fila por día x aula x grupo x rol x estado, independiente del número de alumnos).
+    """
+    R = models.ResumenAsistencia
+    clave = {"fecha": R.fecha, "semana": R.fecha, "grupo": R.grupo, "aula": R.aula_id, "rol": R.rol}[agrupar]
+    q = db.query(clave, R.estado, func.sum(R.cantidad)).filter(R.fecha >= desde, R.fecha <= hasta)
+    if rol:
+        q = q.filter(R.rol == rol)
+    if grupo:
+        q = q.filter(R.grupo == grupo)
+    if aula_id is not None:
+        q = q.filter(R.aula_id == aula_id)
+
+    estados = defaultdict(lambda: defaultdict(int))
+    for valor, estado, cantidad in q.group_by(clave, R.estado):
+        if agrupar == "semana":
+            valor = valor - timedelta(days=valor.weekday())  # lunes de la semana
+        elif agrupar == "aula":
+            valor = valor if valor != SIN_AULA else None
+        elif agrupar == "grupo":
+            valor = valor or None
+        estados[valor][estado] += int(cantidad or 0)
+
+    filas = []
+    for valor, cuenta in estados.items():
+        # Las salidas ("Cumplió horario") no cuentan para asistencia ni puntualidad
+        entradas = sum(n for e, n in cuenta.items() if e != "Cumplió horario")
+        presentes = entradas - cuenta["Ausente"]
+        filas.append({
+            agrupar: valor,
+            "entradas": entradas,
+            "a_tiempo": cuenta["A tiempo"],
+            "tarde": cuenta["Tarde"],
+            "ausente": cuenta["Ausente"],
+            "justificado": cuenta["Justificado"],
+            "salidas": cuenta["Cumplió horario"],
+            "asistencia": round(presentes * 100 / entradas, 1) if entradas else 0.0,
+            "puntualidad": round(cuenta["A tiempo"] * 100 / presentes, 1) if presentes else 0.0,
+        })
+    filas.sort(key=lambda f: (f[agrupar] is None, f[agrupar]))
+    return {"desde": str(desde), "hasta": str(hasta), "agrupar": agrupar, "filas": filas}
+
+
+def reconstruir(db: Session, desde, hasta):
+    """
+    Recalcula ambas tablas de contadores para [desde, hasta] a partir de `asistencias`
+    y `asistencias_archivo` (sin commit): los meses archivados conservan sus reportes.
+    """
+    U = models.Usuario
+    db.query(models.ContadorDiario).filter(
+        models.ContadorDiario.fecha >= desde, models.ContadorDiario.fecha <= hasta
+    ).delete(synchronize_session=False)
+    db.query(models.ResumenAsistencia).filter(
+        models.ResumenAsistencia.fecha >= desde, models.ResumenAsistencia.fecha <= hasta
+    ).delete(synchronize_session=False)
+
+    A = union_all(*[
+        select(T.fecha, T.aula_id, T.rol, T.tipo, T.estado, T.usuario_id)
+        .where(T.fecha >= desde, T.fecha <= hasta)
+        for T in (models.Asistencia, models.AsistenciaArchivo)
+    ]).subquery().c
+    aula = func.coalesce(A.aula_id, SIN_AULA)
+    db.execute(insert(_tabla).from_select(
+        ["fecha", "aula_id", "rol", "entradas", "salidas", "a_tiempo"],
+        select(
+            A.fecha, aula, A.rol,
+            func.sum(case((A.tipo == "Entrada", 1), else_=0)),
+            func.sum(case((A.tipo == "Salida", 1), else_=0)),
+            func.sum(case(((A.tipo == "Entrada") & (A.estado == "A tiempo"), 1), else_=0)),
+        ).group_by(A.fecha, aula, A.rol)
+    ))
+    grupo = func.coalesce(U.grupo, SIN_GRUPO)
+    resultado = db.execute(insert(_resumen).from_select(
+        ["fecha", "aula_id", "grupo", "rol", "estado", "cantidad"],
+        select(A.fecha, aula, grupo, A.rol, A.estado, func.count())
+        .join(U, A.usuario_id == U.id)
+        .group_by(A.fecha, aula, grupo, A.rol, A.estado)
+    ))
+    return resultado.rowcount
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal, Base, engine
+
+    parser = argparse.ArgumentParser(description="Mantenimiento de los contadores de asistencia")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("reconstruir", help="recalcula contadores_diarios y asistencias_resumen")
+    p.add_argument("desde", type=date.fromisoformat)
+    p.add_argument("hasta", type=date.fromisoformat, nargs="?", default=date.today())
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        filas = reconstruir(db, args.desde, args.hasta)
+        db.commit()
+        print(f"✅ Contadores reconstruidos del {args.desde} al {args.hasta} ({filas} filas de resumen)")
+    finally:
+        db.close()
@@ -0,0 +1,160 @@
+"""
+Contraseñas con hash lento y tokens de sesión firmados.
+
+El hash es scrypt (hashlib, sin dependencias extra): a propósito tarda decenas de
+milisegundos de CPU, así que se calcula en un pool de procesos de tamaño fijo
+(CREDENCIALES_PROCESOS) y no en el event loop ni en el threadpool de FastAPI. Con
+toda la plantilla entrando a las 7:00 los logins esperan su turno en el pool y el
+resto de endpoints sigue respondiendo.
+
+Las filas con la contraseña en texto plano (o con parámetros de scrypt viejos) se
+vuelven a guardar con el hash actual la primera vez que el usuario entra bien.
+
+El token de sesión es `datos.firma` (HMAC-SHA256 con SESION_SECRETO): se valida sin
+leer `usuarios`, y los tokens ya vistos quedan en una caché en memoria. Con varios
+workers todos deben compartir SESION_SECRETO; si no se define se genera uno por
+proceso y las sesiones no sobreviven a un reinicio.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from cache import CacheLRU
+
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2 ** 14)))  # costo: 16 MB y ~50 ms por verificación
+SCRYPT_R = 8
+SCRYPT_P = 1
+CREDENCIALES_PROCESOS = int(os.getenv("CREDENCIALES_PROCESOS", str(min(4, os.cpu_count() or 1))))
+
+SESION_SECRETO = (os.getenv("SESION_SECRETO") or secrets.token_hex(32)).encode()
+SESION_HORAS = float(os.getenv("SESION_HORAS", "12"))
+SESIONES_CACHE_MAX = 4096
+
+_PREFIJO = "scrypt"
+
+
+def _b64(datos):
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode()
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _scrypt(password, sal, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=sal, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+
+#----------------- HASH DE CONTRASEÑAS (se ejecutan en el pool) ------------------
+def generar_hash(password):
+    """'scrypt$n$r$p$sal$hash', cabe en usuarios.password (VARCHAR 255)."""
+    sal = os.urandom(16)
+    h = _scrypt(password, sal, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{_PREFIJO}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(sal)}${_b64(h)}"
+
+
+_hash_ficticio = None  # por proceso del pool
+
+
+def _obtener_hash_ficticio():
+    global _hash_ficticio
+    if _hash_ficticio is None:
+        _hash_ficticio = generar_hash(secrets.token_hex(16))
+    return _hash_ficticio
+
+
+def verificar(password, guardado):
+    """
+    Devuelve (correcta, hash_nuevo). hash_nuevo no es None cuando la contraseña es
+    correcta pero lo guardado está en texto plano o con otros parámetros.
+    Sin `guardado` (correo desconocido) se verifica contra un hash ficticio: la
+    respuesta tarda lo mismo y no revela qué cuentas existen.
+    """
+    if password is None:
+        return False, None
+    if not guardado:
+        verificar(password, _obtener_hash_ficticio())
+        return False, None
+    partes = guardado.split("$")
+    if len(partes) != 6 or partes[0] != _PREFIJO:
+        # Fila anterior al hash: comparación en tiempo constante y migración
+        correcta = hmac.compare_digest(password.encode(), guardado.encode())
+        return correcta, generar_hash(password) if correcta else None
+    _, n, r, p, sal, h = partes
+    n, r, p = int(n), int(r), int(p)
+    correcta = hmac.compare_digest(_scrypt(password, _de_b64(sal), n, r, p), _de_b64(h))
+    desactualizado = (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return correcta, generar_hash(password) if correcta and desactualizado else None
+
+
+#----------------- POOL DE PROCESOS ------------------
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        with _lock_pool:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=CREDENCIALES_PROCESOS)
+    return _pool
+
+
+async def verificar_async(password, guardado):
+    return await asyncio.get_running_loop().run_in_executor(_obtener_pool(), verificar, password, guardado)
+
+
+def hash_en_pool(password):
+    """Para endpoints síncronos (alta/edición de usuarios): bloquea el hilo, no el event loop."""
+    return _obtener_pool().submit(generar_hash, password).result()
+
+
+def cerrar():
+    global _pool
+    with _lock_pool:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+#----------------- TOKENS DE SESIÓN ------------------
+CACHE_SESIONES = CacheLRU(maximo=SESIONES_CACHE_MAX, ttl=300)
+
+
+def _firmar(cuerpo):
+    return _b64(hmac.new(SESION_SECRETO, cuerpo.encode(), hashlib.sha256).digest())
+
+
+def emitir_token(datos):
+    """Token firmado con `datos` (id, rol, ...) y su vencimiento."""
+    carga = {**datos, "exp": int(time.time() + SESION_HORAS * 3600)}
+    cuerpo = _b64(json.dumps(carga, separators=(",", ":")).encode())
+    return f"{cuerpo}.{_firmar(cuerpo)}"
+
+
+def validar_token(token):
+    """Datos de la sesión o None si el token es inválido o venció. No consulta la BD."""
+    if not token:
+        return None
+    datos = CACHE_SESIONES.obtener(token)
+    if datos is None:
+        cuerpo, _, firma = token.partition(".")
+        # En bytes: compare_digest rechaza str con caracteres no ASCII (sería un 500)
+        if not firma or not hmac.compare_digest(firma.encode(), _firmar(cuerpo).encode()):
+            return None
+        try:
+            datos = json.loads(_de_b64(cuerpo))
+        except ValueError:
+            return None
+        # Solo los válidos: tokens basura no pueden desalojar sesiones reales de la caché
+        CACHE_SESIONES.guardar(token, datos)
+    if datos["exp"] < time.time():
+        return None
+    return datos
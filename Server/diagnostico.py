@@ -0,0 +1,155 @@
+"""
+Modo diagnóstico de SQL para desarrollo y staging (DB_DIAGNOSTICO=1 en database.py).
+
+- Consulta lenta: toda sentencia que tarde más de DIAGNOSTICO_LENTA_MS se imprime
+  con sus parámetros y el endpoint (ruta y función) que la ejecutó.
+- N+1: al terminar cada petición, si una misma forma de sentencia (el SQL con las
+  listas IN colapsadas) se ejecutó más de DIAGNOSTICO_REPETICIONES veces, se avisa.
+- Informe por endpoint al apagar: peticiones, consultas, tiempo de BD, lentas y N+1.
+
+Cuesta un regex y un Counter por sentencia: no activarlo en producción (para eso
+está /metrics).
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+
+DIAGNOSTICO_LENTA_MS = float(os.getenv("DIAGNOSTICO_LENTA_MS", "100"))
+DIAGNOSTICO_REPETICIONES = int(os.getenv("DIAGNOSTICO_REPETICIONES", "10"))
+FUERA_DE_PETICION = "(fondo)"
+LARGO_MAX = 300  # caracteres de SQL y parámetros al imprimir
+
+_MARCADOR = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_LISTA = re.compile(rf"\(\s*{_MARCADOR}(?:\s*,\s*{_MARCADOR})+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+_peticion = ContextVar("diagnostico_peticion", default=None)
+
+
+def forma(sentencia):
+    """SQL normalizado: `IN (?, ?, ?)` y `VALUES (?, ?)` quedan como `(…)` sin importar el largo."""
+    return _LISTA.sub("(…)", _ESPACIOS.sub(" ", sentencia).strip())
+
+
+def _corto(valor):
+    texto = str(valor)
+    return texto if len(texto) <= LARGO_MAX else texto[:LARGO_MAX] + "…"
+
+
+class _Peticion:
+    __slots__ = ("scope", "formas", "consultas", "segundos", "lentas")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.formas = Counter()
+        self.consultas = 0
+        self.segundos = 0.0
+        self.lentas = 0
+
+    def origen(self):
+        # El router deja la ruta y el endpoint en el scope antes de llamar al handler
+        ruta = getattr(self.scope.get("route"), "path", self.scope["path"])
+        funcion = getattr(self.scope.get("endpoint"), "__name__", "?")
+        return f"{self.scope['method']} {ruta}", funcion
+
+
+class Diagnostico:
+    def __init__(self, lenta_ms=DIAGNOSTICO_LENTA_MS, repeticiones=DIAGNOSTICO_REPETICIONES):
+        self.lenta = lenta_ms / 1000
+        self.repeticiones = repeticiones
+        self._lock = threading.Lock()
+        self.endpoints = {}  # "GET /ruta" -> acumulados
+
+    def _acumular(self, endpoint, funcion, **valores):
+        with self._lock:
+            e = self.endpoints.setdefault(endpoint, {
+                "funcion": funcion, "peticiones": 0, "consultas": 0, "consultas_max": 0,
+                "segundos_bd": 0.0, "lentas": 0, "n_mas_1": 0,
+            })
+            for campo, valor in valores.items():
+                if campo == "consultas_max":
+                    e[campo] = max(e[campo], valor)
+                else:
+                    e[campo] += valor
+
+    #----------------- SENTENCIAS ------------------
+    def antes(self, conn, cursor, sentencia, parametros, contexto, executemany):
+        contexto._diagnostico_inicio = time.perf_counter()
+
+    def despues(self, conn, cursor, sentencia, parametros, contexto, executemany):
+        segundos = time.perf_counter() - contexto._diagnostico_inicio
+        peticion = _peticion.get()
+        if peticion is not None:
+            peticion.consultas += 1
+            peticion.segundos += segundos
+            peticion.formas[forma(sentencia)] += 1
+        if segundos >= self.lenta:
+            endpoint, funcion = peticion.origen() if peticion is not None else (FUERA_DE_PETICION, "-")
+            print(f"🐢 Consulta lenta ({segundos * 1000:.1f} ms) en {endpoint} [{funcion}]\n"
+                  f"   {_corto(forma(sentencia))}\n   parámetros: {_corto(parametros)}")
+            if peticion is not None:
+                peticion.lentas += 1
+            else:
+                self._acumular(FUERA_DE_PETICION, "-", lentas=1)
+
+    def instrumentar(self, engine):
+        motor = getattr(engine, "sync_engine", engine)
+        event.listen(motor, "before_cursor_execute", self.antes)
+        event.listen(motor, "after_cursor_execute", self.despues)
+
+    #----------------- PETICIONES ------------------
+    def comenzar(self, scope):
+        peticion = _Peticion(scope)
+        return peticion, _peticion.set(peticion)
+
+    def terminar(self, peticion, token):
+        _peticion.reset(token)
+        endpoint, funcion = peticion.origen()
+        repetidas = [(n, f) for f, n in peticion.formas.items() if n > self.repeticiones]
+        for n, f in sorted(repetidas, reverse=True):
+            print(f"⚠️ Posible N+1 en {endpoint} [{funcion}]: {n}× {_corto(f)}")
+        self._acumular(endpoint, funcion, peticiones=1, consultas=peticion.consultas,
+                       consultas_max=peticion.consultas, segundos_bd=peticion.segundos,
+                       lentas=peticion.lentas, n_mas_1=1 if repetidas else 0)
+
+    def informe(self):
+        """Endpoints ordenados por tiempo total en la BD."""
+        with self._lock:
+            filas = [{"endpoint": k, **v} for k, v in self.endpoints.items()]
+        return sorted(filas, key=lambda f: f["segundos_bd"], reverse=True)
+
+    def imprimir_informe(self):
+        filas = self.informe()
+        if not filas:
+            return
+        print("\n📊 Diagnóstico SQL por endpoint (tiempo de BD descendente)")
+        print(f"{'endpoint':45} {'peticiones':>10} {'consultas':>10} {'prom':>6} {'max':>5} "
+              f"{'bd_ms':>9} {'lentas':>7} {'n+1':>5}")
+        for f in filas:
+            promedio = f["consultas"] / f["peticiones"] if f["peticiones"] else 0
+            print(f"{f['endpoint'][:45]:45} {f['peticiones']:>10} {f['consultas']:>10} {promedio:>6.1f} "
+                  f"{f['consultas_max']:>5} {f['segundos_bd'] * 1000:>9.1f} {f['lentas']:>7} {f['n_mas_1']:>5}")
+
+
+DIAGNOSTICO = Diagnostico()
+
+
+class MiddlewareDiagnostico:
+    """Abre el contexto de diagnóstico de cada petición HTTP (solo con DB_DIAGNOSTICO=1)."""
+
+    def __init__(self, app, diagnostico=DIAGNOSTICO):
+        self.app = app
+        self.diagnostico = diagnostico
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        peticion, token = self.diagnostico.comenzar(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.diagnostico.terminar(peticion, token)
@@ -0,0 +1,182 @@
+"""
+Escritura agrupada (group commit) para ráfagas de asistencias.
+
+En vez de un COMMIT (y un fsync de MySQL) por escaneo, los handlers encolan la fila
+ya validada y un hilo escritor la inserta junto con las demás que llegaron en los
+últimos milisegundos, en una sola transacción. Cada petición espera a que su lote
+esté confirmado antes de responder, así la respuesta sigue significando "guardado".
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy.exc import IntegrityError
+
+_FIN = object()
+
+
+class EscrituraPendiente:
+    """Lo que devuelve un handler cuando su fila quedó encolada (ver con_db en main.py)."""
+
+    def __init__(self, futuro, responder, si_conflicto):
+        self.futuro = futuro
+        self.responder = responder          # id insertado -> respuesta del endpoint
+        self.si_conflicto = si_conflicto    # excepción a lanzar si la clave única rechaza la fila
+
+    def resolver(self):
+        try:
+            id_insertado = self.futuro.result()
+        except IntegrityError:
+            raise self.si_conflicto
+        return self.responder(id_insertado)
+
+    async def resolver_async(self):
+        try:
+            id_insertado = await asyncio.wrap_future(self.futuro)
+        except IntegrityError:
+            raise self.si_conflicto
+        return self.responder(id_insertado)
+
+
+class EscritorGrupal:
+    def __init__(self, fabrica_sesion, escribir, max_filas=200, espera_ms=5, al_confirmar=None):
+        """
+        fabrica_sesion: crea una Session síncrona (p. ej. SessionLocal).
+        escribir(db, filas) -> ids: inserta las filas (sin commit) y devuelve sus ids en orden.
+        al_confirmar(db): se llama tras el commit de cada lote, después de responder; si
+        falla solo se registra (las filas ya están guardadas).
+        """
+        self.fabrica_sesion = fabrica_sesion
+        self.escribir = escribir
+        self.al_confirmar = al_confirmar
+        self.max_filas = max_filas
+        self.espera = espera_ms / 1000
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._observadores = []
+        self.lotes = 0
+        self.filas = 0
+        self.lote_max = 0
+        self.errores_al_confirmar = 0
+        self.latencia_total = 0.0
+        self.latencia_max = 0.0
+        self.conflictos = 0
+
+    def agregar_observador(self, fn):
+        """fn(tamano_lote, segundos_de_volcado) se llama tras cada lote (métricas)."""
+        self._observadores.append(fn)
+
+    def enviar(self, fila):
+        """Encola una fila y devuelve un Future con su id (o la excepción de la BD)."""
+        self._arrancar()
+        futuro = Future()
+        self._cola.put((fila, futuro))
+        return futuro
+
+    def detener(self):
+        """Vuelca lo pendiente y termina el hilo (al apagar la app)."""
+        if self._hilo is not None:
+            self._cola.put(_FIN)
+            self._hilo.join()
+            self._hilo = None
+
+    def estadisticas(self):
+        return {
+            "lotes": self.lotes,
+            "filas": self.filas,
+            "filas_por_lote": round(self.filas / self.lotes, 2) if self.lotes else 0.0,
+            "lote_max": self.lote_max,
+            "volcado_promedio_ms": round(self.latencia_total * 1000 / self.lotes, 3) if self.lotes else 0.0,
+            "volcado_max_ms": round(self.latencia_max * 1000, 3),
+            "conflictos": self.conflictos,
+            "errores_al_confirmar": self.errores_al_confirmar,
+            "max_filas": self.max_filas,
+            "espera_ms": self.espera * 1000,
+        }
+
+    def _arrancar(self):
+        if self._hilo is None:
+            with self._lock:
+                if self._hilo is None:
+                    self._hilo = threading.Thread(target=self._bucle, name="escritor-grupal", daemon=True)
+                    self._hilo.start()
+
+    def _bucle(self):
+        terminar = False
+        while not terminar:
+            primero = self._cola.get()
+            if primero is _FIN:
+                break
+            lote = [primero]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.max_filas:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is _FIN:
+                    terminar = True
+                    break
+                lote.append(item)
+            self._volcar(lote)
+
+    def _volcar(self, lote):
+        inicio = time.perf_counter()
+        db = self.fabrica_sesion()
+        try:
+            try:
+                ids = self.escribir(db, [fila for fila, _ in lote])
+                db.commit()
+                resultados = [(futuro, id_, None) for (_, futuro), id_ in zip(lote, ids)]
+            except IntegrityError:
+                # Algún duplicado (doble escaneo): se reintenta fila a fila con SAVEPOINT
+                # para que solo fallen las filas en conflicto
+                db.rollback()
+                resultados = []
+                for fila, futuro in lote:
+                    try:
+                        with db.begin_nested():
+                            id_ = self.escribir(db, [fila])[0]
+                        resultados.append((futuro, id_, None))
+                    except IntegrityError as e:
+                        self.conflictos += 1
+                        resultados.append((futuro, None, e))
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            resultados = [(futuro, None, e) for _, futuro in lote]
+            confirmado = False
+        else:
+            confirmado = True
+
+        # Se responde apenas el lote es durable: un error después no debe convertir
+        # filas guardadas en errores (los reintentos volverían como duplicados)
+        for futuro, id_, error in resultados:
+            if error is not None:
+                futuro.set_exception(error)
+            else:
+                futuro.set_result(id_)
+
+        try:
+            if confirmado and self.al_confirmar is not None:
+                self.al_confirmar(db)
+        except Exception as e:
+            db.rollback()
+            self.errores_al_confirmar += 1
+            print(f"⚠️ Escritor agrupado: al_confirmar falló tras guardar {len(lote)} filas: {e}")
+        finally:
+            db.close()
+
+        segundos = time.perf_counter() - inicio
+        self.lotes += 1
+        self.filas += len(lote)
+        self.lote_max = max(self.lote_max, len(lote))
+        self.latencia_total += segundos
+        self.latencia_max = max(self.latencia_max, segundos)
+        for fn in self._observadores:
+            fn(len(lote), segundos)
@@ -0,0 +1,213 @@
+"""
+Estado de marcaje que antes vivía en dicts del módulo (VENTANAS_ACTIVAS, LAST_RESULT).
+
+- AlmacenMemoria: un solo proceso (uvicorn sin --workers), igual que antes.
+- AlmacenBD: tabla `estado_compartido`, visible para todos los workers y hosts.
+  Usa la sesión de la petición, así la ventana se publica en la misma
+  transacción que la entrada del docente (y por el driver async si está activo).
+
+Se elige con ESTADO_BACKEND=memoria|bd.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from uuid import uuid4
+import models
+from database import upsert
+
+# Cuánto se conserva una ventana después de su fin: permite procesar lotes atrasados
+# de escáneres (ver /api/asistencias/qr/batch) y luego se purga
+RETENCION_VENTANAS = timedelta(hours=12)
+
+RESULTADO_INICIAL = {"estado": "advertencia", "mensaje": "Esperando QR"}
+
+_CAMPOS_FECHA = ("inicio", "fin", "tardanza")
+_PREFIJO_VENTANA = "ventana:"
+
+
+class AlmacenEstado:
+    """Operaciones de alto nivel sobre un almacén clave/valor con caducidad."""
+
+    # Versión de las tablas aún no modificadas; cambia en cada arranque porque
+    # los datos pudieron cambiar mientras el proceso estaba detenido
+    version_inicial = uuid4().hex[:12]
+
+    # Ventanas de marcaje. Al cerrarse (salida del docente o fin del plazo) no se borran:
+    # el planificador registra los ausentes y las marca `procesada`; se purgan al
+    # terminar RETENCION_VENTANAS.
+    def abrir_ventana(self, db, aula_id, inicio, fin, tardanza):
+        self._guardar_ventana(db, aula_id, {"inicio": inicio, "fin": fin, "tardanza": tardanza,
+                                            "procesada": False})
+
+    def obtener_ventana(self, db, aula_id):
+        valor = self._obtener(db, f"{_PREFIJO_VENTANA}{aula_id}")
+        return _leer_ventana(valor) if valor is not None else None
+
+    def cerrar_ventana(self, db, aula_id, ahora):
+        """Adelanta el fin de la ventana a `ahora`; si no había, deja una ya cerrada para los ausentes."""
+        ventana = self.obtener_ventana(db, aula_id) or {"inicio": ahora, "fin": ahora, "tardanza": ahora,
+                                                        "procesada": False}
+        if ventana["procesada"]:
+            return
+        ventana["fin"] = min(ventana["fin"], ahora)
+        self._guardar_ventana(db, aula_id, ventana)
+
+    def ventanas_vencidas(self, db, ahora):
+        """[(aula_id, ventana)] cerradas o vencidas cuyos ausentes aún no se registraron."""
+        vencidas = []
+        for valor in self._listar(db, _PREFIJO_VENTANA):
+            ventana = _leer_ventana(valor)
+            if not ventana["procesada"] and ventana["fin"] <= ahora:
+                vencidas.append((valor.get("aula_id"), ventana))
+        return vencidas
+
+    def marcar_procesada(self, db, aula_id, ventana):
+        """
+        Marca `ventana` como procesada si sigue guardada (mismo `inicio`). Si el docente abrió
+        otra mientras se registraban los ausentes, la nueva no se toca. Devuelve si se marcó.
+        """
+        clave = f"{_PREFIJO_VENTANA}{aula_id}"
+        valor = self._obtener(db, clave)
+        if valor is None or valor["inicio"] != ventana["inicio"].isoformat():
+            return False
+        return self._reemplazar(db, clave, valor, {**valor, "procesada": True})
+
+    def _guardar_ventana(self, db, aula_id, ventana):
+        valor = {k: v.isoformat() if k in _CAMPOS_FECHA else v for k, v in ventana.items()}
+        self._guardar(db, f"{_PREFIJO_VENTANA}{aula_id}", {**valor, "aula_id": aula_id},
+                      ventana["fin"] + RETENCION_VENTANAS)
+
+    def obtener_resultado(self, db):
+        return self._obtener(db, "resultado") or dict(RESULTADO_INICIAL)
+
+    def fijar_resultado(self, db, resultado):
+        self._guardar(db, "resultado", resultado, None)
+
+    def version(self, db, tabla):
+        """Token de versión de una tabla (ETag de los listados)."""
+        return self._obtener(db, f"version:{tabla}") or self.version_inicial
+
+    def tocar(self, db, *tablas):
+        """Cambia el token de versión de las tablas modificadas."""
+        token = uuid4().hex[:12]
+        for tabla in tablas:
+            self._guardar(db, f"version:{tabla}", token, None)
+
+    # Primitivas de cada backend
+    def _obtener(self, db, clave):
+        raise NotImplementedError
+
+    def _listar(self, db, prefijo):
+        """Valores vigentes cuyas claves empiezan con `prefijo`."""
+        raise NotImplementedError
+
+    def _guardar(self, db, clave, valor, expira):
+        raise NotImplementedError
+
+    def _reemplazar(self, db, clave, anterior, valor):
+        """Guarda `valor` solo si el actual sigue siendo `anterior` (conserva la caducidad)."""
+        raise NotImplementedError
+
+    def _borrar(self, db, clave):
+        raise NotImplementedError
+
+    def purgar(self, db):
+        """Elimina las entradas caducadas; devuelve cuántas se borraron."""
+        raise NotImplementedError
+
+
+class AlmacenMemoria(AlmacenEstado):
+    def __init__(self):
+        self._datos = {}  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+
+    def _obtener(self, db, clave):
+        expira, valor = self._datos.get(clave, (None, None))
+        if expira is not None and expira < datetime.now():
+            return None
+        return valor
+
+    def _listar(self, db, prefijo):
+        ahora = datetime.now()
+        with self._lock:
+            return [valor for clave, (expira, valor) in self._datos.items()
+                    if clave.startswith(prefijo) and (expira is None or expira >= ahora)]
+
+    def _guardar(self, db, clave, valor, expira):
+        with self._lock:
+            self._datos[clave] = (expira, valor)
+
+    def _reemplazar(self, db, clave, anterior, valor):
+        with self._lock:
+            expira, actual = self._datos.get(clave, (None, None))
+            if actual != anterior:
+                return False
+            self._datos[clave] = (expira, valor)
+            return True
+
+    def _borrar(self, db, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def purgar(self, db):
+        ahora = datetime.now()
+        with self._lock:
+            caducadas = [k for k, (expira, _) in self._datos.items() if expira is not None and expira < ahora]
+            for clave in caducadas:
+                self._datos.pop(clave, None)
+        return len(caducadas)
+
+
+class AlmacenBD(AlmacenEstado):
+    _tabla = models.EstadoCompartido.__table__
+
+    def _obtener(self, db, clave):
+        fila = db.query(models.EstadoCompartido.valor, models.EstadoCompartido.expira).filter(
+            models.EstadoCompartido.clave == clave
+        ).first()
+        if fila is None or (fila.expira is not None and fila.expira < datetime.now()):
+            return None
+        return json.loads(fila.valor)
+
+    def _listar(self, db, prefijo):
+        E = models.EstadoCompartido
+        filas = db.query(E.valor).filter(
+            E.clave.like(f"{prefijo}%"), (E.expira.is_(None)) | (E.expira >= datetime.now())
+        )
+        return [json.loads(valor) for valor, in filas]
+
+    def _guardar(self, db, clave, valor, expira):
+        texto = json.dumps(valor)
+        upsert(db, self._tabla, {"clave": clave, "valor": texto, "expira": expira},
+               {"valor": texto, "expira": expira})
+
+    def _reemplazar(self, db, clave, anterior, valor):
+        # UPDATE ... WHERE valor = <anterior>: si otro worker lo cambió, no afecta filas
+        E = models.EstadoCompartido
+        return db.query(E).filter(E.clave == clave, E.valor == json.dumps(anterior)).update(
+            {E.valor: json.dumps(valor)}, synchronize_session=False
+        ) == 1
+
+    def _borrar(self, db, clave):
+        db.query(models.EstadoCompartido).filter(models.EstadoCompartido.clave == clave).delete()
+
+    def purgar(self, db):
+        return db.query(models.EstadoCompartido).filter(
+            models.EstadoCompartido.expira < datetime.now()
+        ).delete(synchronize_session=False)
+
+
+def _leer_ventana(valor):
+    ventana = {k: datetime.fromisoformat(valor[k]) for k in _CAMPOS_FECHA}
+    ventana["procesada"] = valor.get("procesada", False)
+    return ventana
+
+
+def crear_almacen(backend=None):
+    backend = backend or os.getenv("ESTADO_BACKEND", "memoria")
+    if backend == "bd":
+        return AlmacenBD()
+    if backend == "memoria":
+        return AlmacenMemoria()
+    raise ValueError(f"ESTADO_BACKEND desconocido: {backend}")
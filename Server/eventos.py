@@ -0,0 +1,64 @@
+"""
+Bus de eventos en proceso para /api/eventos (Server-Sent Events).
+
+Los handlers publican eventos compactos después de hacer commit; cada cliente
+conectado tiene una cola acotada y recibe solo los eventos de su aula/grupo.
+`publicar` se puede llamar desde el hilo del threadpool (modo síncrono) o desde
+el propio event loop (modo async con run_sync).
+
+Nota: el bus es por proceso; con varios workers cada dashboard recibe los eventos
+de las escrituras que atendió su mismo worker.
+"""
+import asyncio
+import threading
+
+COLA_MAX = 100  # eventos pendientes por cliente; si se llena se descartan (cliente lento)
+
+
+class Suscripcion:
+    def __init__(self, loop, aula_id=None, grupo=None):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=COLA_MAX)
+        self.aula_id = aula_id
+        self.grupo = grupo
+        self.descartados = 0
+
+    def acepta(self, evento):
+        if self.aula_id is not None and evento.get("aula_id") != self.aula_id:
+            return False
+        # Los eventos sin grupo (docentes, ausentes del aula) llegan a todos los grupos
+        if self.grupo and evento.get("grupo") not in (None, self.grupo):
+            return False
+        return True
+
+    def _entregar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.descartados += 1
+
+
+class BusEventos:
+    def __init__(self):
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+
+    def suscribir(self, aula_id=None, grupo=None):
+        """Debe llamarse desde el event loop (endpoint async)."""
+        sub = Suscripcion(asyncio.get_running_loop(), aula_id, grupo)
+        with self._lock:
+            self._suscripciones.add(sub)
+        return sub
+
+    def cancelar(self, sub):
+        with self._lock:
+            self._suscripciones.discard(sub)
+
+    def publicar(self, evento):
+        with self._lock:
+            destinos = [s for s in self._suscripciones if s.acepta(evento)]
+        for sub in destinos:
+            sub.loop.call_soon_threadsafe(sub._entregar, evento)
+
+    def conectados(self):
+        return len(self._suscripciones)
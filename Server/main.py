@@ -1,23 +1,101 @@
-from fastapi import FastAPI, HTTPException, Depends, Body, Path
+from arranque import Arranque, verificar_esquema
+from fastapi import FastAPI, HTTPException, Depends, Body, Header, Path, Query, Request, BackgroundTasks, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from sqlalchemy import text  
+from fastapi.encoders import jsonable_encoder
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import text, or_, select, insert, literal, func, union_all
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from uuid import uuid4
-from database import engine, Base, get_db
+from database import engine, SessionLocal, AsyncSessionLocal, Base, get_db, get_async_db, DB_ASYNC, estado_pools
+from database import async_engine, calentar_pool, calentar_pool_async, DB_DIAGNOSTICO
+from diagnostico import DIAGNOSTICO, MiddlewareDiagnostico
 import datetime
 import models
+import contadores
+import metricas
+import credenciales
+from estado_compartido import crear_almacen
+from eventos import BusEventos
+from escritura_grupal import EscritorGrupal, EscrituraPendiente
+from snapshots import TrabajoSnapshot
+from archivos import AlmacenArchivos, ArchivoDemasiadoGrande, tipo_base, tipo_permitido
+from archivado import Archivador, corte_valido, incluir_archivo
+from planificador import Planificador
+import asyncio
 import base64
+import os
+from collections import Counter
+import csv
+import io
+import json
+import inspect
+import re
+import zlib
+from contextlib import asynccontextmanager
+from typing import NamedTuple
+from cache import CacheLRU
+try:
+    import orjson  # opcional (pip install orjson): serializa listados varias veces más rápido
+except ImportError:
+    orjson = None
 from datetime import datetime, date, timedelta, time
 
-# 1. Crear tablas en MySQL (si no existen)
-Base.metadata.create_all(bind=engine)
+# 1. Arranque y apagado (lifespan): esquema, pools y tareas de fondo
+ARRANQUE = Arranque()
+ARRANQUE_REINTENTO_SEG = 5  # si MySQL no responde al arrancar, se reintenta en segundo plano
+
+async def preparar():
+    # Crear tablas en MySQL (si no existen) solo si los modelos cambiaron (ver arranque.py)
+    with ARRANQUE.fase("esquema"):
+        ARRANQUE.detalle["esquema"] = await run_in_threadpool(verificar_esquema, engine, Base.metadata)
+    # Conexiones abiertas antes de la primera petición
+    with ARRANQUE.fase("pools"):
+        ARRANQUE.detalle["conexiones_sync"] = await run_in_threadpool(calentar_pool)
+        ARRANQUE.detalle["conexiones_async"] = await calentar_pool_async()
+
+async def intentar_arranque():
+    ARRANQUE.comenzar()
+    try:
+        await preparar()
+    except Exception as e:
+        ARRANQUE.terminar(error=str(e))
+        print(f"❌ Arranque incompleto ({e}); reintento en {ARRANQUE_REINTENTO_SEG}s")
+        return False
+    ARRANQUE.terminar()
+    print(f"✅ Listo en {ARRANQUE.total_ms} ms {ARRANQUE.fases} (esquema: {ARRANQUE.detalle['esquema']})")
+    return True
+
+async def reintentar_arranque():
+    while True:
+        await asyncio.sleep(ARRANQUE_REINTENTO_SEG)
+        if await intentar_arranque():
+            return
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # Si la BD no responde la app arranca igual (liveness OK) y /api/ready da 503 hasta que conteste
+    reintentos = None if await intentar_arranque() else asyncio.create_task(reintentar_arranque())
+    PLANIFICADOR.iniciar()
+    yield
+    if reintentos is not None:
+        reintentos.cancel()
+    PLANIFICADOR.detener()
+    if ESCRITOR is not None:
+        ESCRITOR.detener()
+    credenciales.cerrar()
+    if DB_DIAGNOSTICO:
+        DIAGNOSTICO.imprimir_informe()
 
 # 2. Crear aplicación FastAPI
 app = FastAPI(
     title="Sistema IoT Asistencia",
     description="Backend para tu proyecto con ESP32",
-    version="1.0"
+    version="1.0",
+    lifespan=ciclo_de_vida
 )
 
 # 3. Permitir conexión desde frontend
@@ -29,7 +107,125 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 4. RUTA DE PRUEBA BÁSICA
+# Listados grandes comprimidos con gzip (los eventos SSE quedan excluidos por Starlette).
+# Los adjuntos de justificantes no pasan por gzip: PDF/JPEG ya vienen comprimidos y así
+# FileResponse conserva Content-Length, Range y el envío sin copia (pathsend)
+SIN_GZIP = re.compile(r"^/api/justificantes/\d+/archivo$")
+
+class GZipSalvoAdjuntos(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and SIN_GZIP.match(scope["path"]):
+            return await self.app(scope, receive, send)
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(GZipSalvoAdjuntos, minimum_size=1000, compresslevel=5)
+
+# Latencia por ruta y consultas SQL por petición (GET /metrics, formato Prometheus).
+# Se agrega al final para quedar por fuera: mide también gzip y CORS
+app.add_middleware(metricas.MiddlewareMetricas)
+metricas.instrumentar(engine)
+if async_engine is not None:
+    metricas.instrumentar(async_engine)
+if DB_DIAGNOSTICO:
+    app.add_middleware(MiddlewareDiagnostico)
+
+class RespuestaJSON(JSONResponse):
+    """
+    Respuesta para los listados: se devuelve ya construida desde el endpoint, así
+    FastAPI no recorre otra vez el contenido con jsonable_encoder. Con orjson las
+    fechas y horas se serializan en C; sin orjson se usa el codificador de FastAPI.
+    """
+
+    def render(self, contenido):
+        if orjson is not None:
+            return orjson.dumps(contenido)
+        return super().render(jsonable_encoder(contenido))
+
+#----------------- ETAG DE LISTADOS ------------------
+# Cada tabla tiene un token de versión en ESTADO que cambia con cada escritura.
+# Los listados lo envían como ETag y responden 304 sin leer las filas si el
+# navegador ya tiene esa versión (If-None-Match).
+
+def tocar_tablas(db: Session, *tablas):
+    """Invalida los ETag de los listados de `tablas`; llamar después del commit de los datos."""
+    ESTADO.tocar(db, *tablas)
+    db.commit()
+
+def etag_listado(db: Session, request: Request, *tablas):
+    versiones = "-".join(ESTADO.version(db, t) for t in tablas)
+    consulta = zlib.crc32(request.url.query.encode())
+    return f'W/"{versiones}-{consulta:08x}"'
+
+def cabeceras_etag(etag):
+    # no-cache: el navegador guarda la respuesta pero revalida siempre con el ETag
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def no_modificado(request: Request, etag):
+    """Respuesta 304 si el cliente ya tiene esta versión; None si hay que enviar el listado."""
+    cabecera = request.headers.get("if-none-match")
+    if cabecera and (cabecera.strip() == "*" or etag in [e.strip() for e in cabecera.split(",")]):
+        return Response(status_code=304, headers=cabeceras_etag(etag))
+    return None
+
+# 4. ENDPOINTS CON SESIÓN SÍNCRONA O ASÍNCRONA
+def con_db(ruta):
+    """
+    Registra un endpoint escrito con `db: Session = Depends(get_db)` en el modo que indique DB_ASYNC.
+
+    - DB_ASYNC=1: el endpoint es `async def`; la lógica se ejecuta con `AsyncSession.run_sync`,
+      así la E/S va por el driver asíncrono (aiomysql) y no ocupa un hilo del threadpool.
+    - DB_ASYNC=0: se registra como endpoint síncrono.
+
+    Si la lógica devuelve una EscrituraPendiente (escritura agrupada), se espera a que
+    su lote esté confirmado antes de responder.
+    Devuelve la función original para poder llamarla desde otras partes del código.
+    """
+    def decorador(logica):
+        firma = inspect.signature(logica)
+        if DB_ASYNC:
+            async def endpoint(**kwargs):
+                db = kwargs.pop("db")
+                resultado = await db.run_sync(lambda sesion: logica(db=sesion, **kwargs))
+                if isinstance(resultado, EscrituraPendiente):
+                    resultado = await resultado.resolver_async()
+                return resultado
+
+            firma = firma.replace(parameters=[
+                p.replace(default=Depends(get_async_db)) if p.name == "db" else p
+                for p in firma.parameters.values()
+            ])
+        else:
+            def endpoint(**kwargs):
+                resultado = logica(**kwargs)
+                if isinstance(resultado, EscrituraPendiente):
+                    resultado = resultado.resolver()
+                return resultado
+
+        endpoint.__signature__ = firma
+        endpoint.__name__ = logica.__name__
+        endpoint.__doc__ = logica.__doc__
+        ruta(endpoint)
+        return logica
+    return decorador
+
+async def en_sesion(fn):
+    """
+    fn(db) con una sesión propia, para endpoints `async def` que además esperan otra
+    cosa (p. ej. el pool de credenciales): driver async si DB_ASYNC=1, threadpool si no.
+    """
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn)
+
+    def sincrono():
+        db = SessionLocal()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+    return await run_in_threadpool(sincrono)
+
+# 5. RUTA DE PRUEBA BÁSICA
 @app.get("/")
 def inicio():
     return {
@@ -39,7 +235,7 @@ def inicio():
         "estado": "Listo para conectar frontend"
     }
 
-# 5. RUTA PARA VERIFICAR CONEXIÓN A BD - VERSIÓN CORREGIDA
+# 6. RUTA PARA VERIFICAR CONEXIÓN A BD - VERSIÓN CORREGIDA
 @app.get("/api/status")
 def verificar_estado():
     try:
@@ -66,52 +262,128 @@ def verificar_estado():
             "sugerencia": "Verifica DATABASE_URL en database.py"
         }
 
+@app.get("/metrics", include_in_schema=False)
+def exponer_metricas():
+    # Por worker: con --workers N cada proceso expone las suyas
+    return Response(metricas.METRICAS.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/ready")
+def listo():
+    # Sonda de disponibilidad: 200 solo cuando el esquema está verificado y los pools calientes
+    return JSONResponse(ARRANQUE.estado(), status_code=200 if ARRANQUE.listo else 503)
+
+@app.get("/api/status/pool")
+def estado_pool():
+    # Conexiones en uso/libres, overflow, espera por checkout e invalidaciones (por worker)
+    return estado_pools()
+
 class LoginRequest(BaseModel):
   correo: str
   password: str
 
 class LoginResponse(BaseModel):
   user: dict  # devolvemos solo los datos básicos del usuario
+  token: str  # sesión firmada: enviar como "Authorization: Bearer <token>"
 
 
 #----------------PARTE DEL LOGIN------------------
+def buscar_credenciales(db: Session, correo):
+  return db.query(models.Usuario.id, models.Usuario.nombre, models.Usuario.correo,
+                  models.Usuario.rol, models.Usuario.password).filter(models.Usuario.correo == correo).first()
+
+def guardar_hash(db: Session, usuario_id, hash_nuevo):
+  db.query(models.Usuario).filter(models.Usuario.id == usuario_id).update(
+    {models.Usuario.password: hash_nuevo}, synchronize_session=False)
+  db.commit()
+
 @app.post("/api/login", response_model=LoginResponse)
-def login(body: LoginRequest, db: Session = Depends(get_db)):
+async def login(body: LoginRequest):
   # Buscar usuario por correo
-  user = db.query(models.Usuario).filter(models.Usuario.correo == body.correo).first()
+  user = await en_sesion(lambda db: buscar_credenciales(db, body.correo))
 
-  # Validar credenciales (usa hash si lo implementas)
-  if not user or user.password != body.password:
+  # El hash se verifica en el pool de procesos: el event loop sigue atendiendo
+  correcta, hash_nuevo = await credenciales.verificar_async(body.password, user.password if user else None)
+  if not correcta:
     raise HTTPException(status_code=401, detail="Credenciales inválidas")
+  if hash_nuevo is not None:
+    # Contraseña en texto plano o con parámetros viejos: se migra al entrar
+    await en_sesion(lambda db: guardar_hash(db, user.id, hash_nuevo))
 
   # Responder solo con los datos necesarios del usuario
-  return {"user": {
+  datos = {
     "id": user.id,
     "nombre": user.nombre,
     "correo": user.correo,
     "rol": user.rol
-  }}
+  }
+  return {"user": datos, "token": credenciales.emitir_token({"id": user.id, "rol": user.rol})}
+
+def sesion_actual(authorization: str = Header(None)):
+  """Dependencia: datos del token Bearer, validado en memoria (sin consultar usuarios)."""
+  esquema, _, token = (authorization or "").partition(" ")
+  datos = credenciales.validar_token(token) if esquema.lower() == "bearer" else None
+  if datos is None:
+    raise HTTPException(status_code=401, detail="Sesión inválida o vencida",
+                        headers={"WWW-Authenticate": "Bearer"})
+  return datos
+
+@app.get("/api/sesion")
+def ver_sesion(sesion: dict = Depends(sesion_actual)):
+  return {"sesion": sesion}
   
   
   
   
+#----------------- CACHÉ CÉDULA → USUARIO (ruta caliente del QR) ------------------
+CACHE_USUARIOS_MAX = 4096   # entradas (una por cédula)
+CACHE_USUARIOS_TTL = 300    # segundos; acota el desfase entre workers
+
+class UsuarioQR(NamedTuple):
+    """Proyección mínima del usuario que necesita el registro por QR."""
+    id: int
+    rol: str
+    nombre: str
+    cedula: str
+    activo: bool
+    grupo: str | None
+
+CACHE_USUARIOS = CacheLRU(maximo=CACHE_USUARIOS_MAX, ttl=CACHE_USUARIOS_TTL)
+
+def buscar_usuario_por_cedula(db: Session, cedula: str):
+    """Devuelve UsuarioQR o None; también se cachean las cédulas inexistentes."""
+    usuario = CACHE_USUARIOS.obtener(cedula, defecto=False)
+    if usuario is not False:
+        return usuario
+    fila = (
+        db.query(models.Usuario.id, models.Usuario.rol, models.Usuario.nombre,
+                 models.Usuario.cedula, models.Usuario.activo, models.Usuario.grupo)
+        .filter(models.Usuario.cedula == cedula)
+        .first()
+    )
+    usuario = UsuarioQR(*fila) if fila else None
+    CACHE_USUARIOS.guardar(cedula, usuario)
+    return usuario
+
+@app.get("/api/status/cache")
+def estado_cache():
+    return {"usuarios": CACHE_USUARIOS.estadisticas(), "sesiones": credenciales.CACHE_SESIONES.estadisticas()}
+
 #----------------- LISTAR USUARIOS ------------------
-@app.get("/api/usuarios")
-def listar_usuarios(db: Session = Depends(get_db)):
-    usuarios = db.query(models.Usuario).all()
-    # Serializa cada usuario a dict
-    usuarios_dict = [
-        {
-            "id": u.id,
-            "nombre": u.nombre,
-            "cedula": u.cedula,
-            "rol": u.rol,
-            "grupo": u.grupo,
-            "correo": u.correo
-        }
-        for u in usuarios
-    ]
-    return {"usuarios": usuarios_dict}
+@con_db(app.get("/api/usuarios"))
+def listar_usuarios(request: Request, db: Session = Depends(get_db)):
+    etag = etag_listado(db, request, "usuarios")
+    if (r := no_modificado(request, etag)) is not None:
+        return r
+    # Solo las columnas que se devuelven (sin password ni entidades ORM)
+    usuarios = db.query(
+        models.Usuario.id,
+        models.Usuario.nombre,
+        models.Usuario.cedula,
+        models.Usuario.rol,
+        models.Usuario.grupo,
+        models.Usuario.correo
+    ).all()
+    return RespuestaJSON({"usuarios": [u._asdict() for u in usuarios]}, headers=cabeceras_etag(etag))
 
 #----------------- CREAR USUARIO ------------------
 class UsuarioCreate(BaseModel):
@@ -129,10 +401,15 @@ def crear_usuario(user: UsuarioCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Cédula ya registrada")
     if db.query(models.Usuario).filter(models.Usuario.correo == user.correo).first():
         raise HTTPException(status_code=400, detail="Correo ya registrado")
-    nuevo = models.Usuario(**user.dict())
+    datos = user.dict()
+    if datos["password"]:
+        datos["password"] = credenciales.hash_en_pool(datos["password"])
+    nuevo = models.Usuario(**datos)
     db.add(nuevo)
     db.commit()
+    tocar_tablas(db, "usuarios")
     db.refresh(nuevo)
+    CACHE_USUARIOS.invalidar(nuevo.cedula)  # puede haber un "no encontrado" en caché
     return {"user": {
         "id": nuevo.id,
         "nombre": nuevo.nombre,
@@ -156,10 +433,15 @@ def actualizar_usuario(id: int, user: UsuarioUpdate, db: Session = Depends(get_d
     u = db.query(models.Usuario).filter(models.Usuario.id == id).first()
     if not u:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    cedula_anterior = u.cedula
     for key, value in user.dict(exclude_unset=True).items():
+        if key == "password" and value:
+            value = credenciales.hash_en_pool(value)
         setattr(u, key, value)
     db.commit()
+    tocar_tablas(db, "usuarios")
     db.refresh(u)
+    CACHE_USUARIOS.invalidar(cedula_anterior, u.cedula)
     return {"user": {
         "id": u.id,
         "nombre": u.nombre,
@@ -177,9 +459,49 @@ def eliminar_usuario(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     db.delete(u)
     db.commit()
+    tocar_tablas(db, "usuarios")
+    CACHE_USUARIOS.invalidar(u.cedula)
     return {"success": True, "id": id}
 
 
+#----------------- EVENTOS EN VIVO (Server-Sent Events) ------------------
+BUS = BusEventos()
+EVENTOS_PING_SEG = 15  # comentario keep-alive para proxies y para detectar desconexiones
+CAMPOS_EVENTO = ("id", "usuario_id", "rol", "tipo", "estado", "fecha", "hora", "aula_id")
+
+def evento_asistencia(evento, reg, grupo=None, **extra):
+    """Evento compacto a partir de una Asistencia o de un dict con sus columnas."""
+    datos = reg if isinstance(reg, dict) else {c: getattr(reg, c) for c in CAMPOS_EVENTO}
+    return {"evento": evento, **{c: datos.get(c) for c in CAMPOS_EVENTO}, "grupo": grupo, **extra}
+
+def evento_ausentes(fecha, aula_id, total):
+    return {"evento": "ausentes", "fecha": str(fecha), "aula_id": aula_id, "grupo": None, "total": total}
+
+def publicar_evento(evento, reg, grupo=None, **extra):
+    """Publica un evento de asistencia; llamar después del commit."""
+    BUS.publicar(evento_asistencia(evento, reg, grupo, **extra))
+
+@app.get("/api/eventos")
+async def eventos_en_vivo(request: Request, aula_id: int | None = None, grupo: str | None = None):
+    """Stream SSE con las nuevas asistencias, cambios de estado, justificantes y ausentes."""
+    sub = BUS.suscribir(aula_id, grupo)
+
+    async def flujo():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(sub.cola.get(), timeout=EVENTOS_PING_SEG)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {evento['evento']}\ndata: {json.dumps(evento, default=str, ensure_ascii=False)}\n\n"
+        finally:
+            BUS.cancelar(sub)
+
+    return StreamingResponse(flujo(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # ------------- LECTURA DE QR Y REGISTRO DE ASISTENCIA -------------
 
 # Configuración de horarios
@@ -190,8 +512,11 @@ HORA_SALIDA  = time(12, 0)  # ejemplo
 VENTANA_MIN = 30            # minutos que dura la ventana de marcaje para estudiantes
 TARDANZA_EST_MIN = 2        # minutos para considerar tardanza al estudiante tras marcar el docente
 
-# Estado de ventana por aula (aula_id: dict con fin y tardanza)
-VENTANAS_ACTIVAS = {}
+AUSENTES_LOTE = 500         # estudiantes por transacción al registrar ausentes (planificador)
+
+# Estado de ventana por aula y último resultado para la ESP32 (ver estado_compartido.py;
+# con ESTADO_BACKEND=bd se comparte entre workers de uvicorn)
+ESTADO = crear_almacen()
 
 def extraer_info(base64_str):
     texto = base64.b64decode(base64_str).decode('utf-8')
@@ -199,98 +524,206 @@ def extraer_info(base64_str):
         return texto.split('@', 1)
     return texto, None
 
-class QRAsistencia(BaseModel):
-    qr_texto: str
-
-# Registrar asistencia desde QR
-@app.post("/api/asistencias/qr")
-def registrar_asistencia_qr(body: QRAsistencia, db: Session = Depends(get_db)):
-    cedula, _ = extraer_info(body.qr_texto)
+def normalizar_cedula(cedula):
+    # Quita ceros a la izquierda del último tramo (p. ej. 8-123-0045 → 8-123-45)
     partes = cedula.split('-')
     partes[-1] = partes[-1].lstrip('0')
-    cedula = '-'.join(partes)
+    return '-'.join(partes)
 
-    usuario = db.query(models.Usuario).filter(models.Usuario.cedula == cedula).first()
-    if not usuario:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+def marcar_ausentes(db: Session, hoy, ahora, aula_id, limite=None):
+    """
+    Inserta "Ausente" para hasta `limite` estudiantes sin entrada en `hoy` (un lote, sin
+    commit) y devuelve cuántas filas se insertaron; 0 cuando ya no quedan.
+    Un INSERT ... SELECT por grupo: el rowcount da el conteo exacto para el resumen.
+    """
+    A, U = models.Asistencia, models.Usuario
+    limite = limite or AUSENTES_LOTE
+    tiene_entrada = (
+        select(A.id)
+        .where(A.usuario_id == U.id, A.fecha == hoy, A.tipo == "Entrada")
+        .exists()
+    )
+    pendientes = select(U.id, U.grupo).where(U.rol == "Estudiante", ~tiene_entrada)
+    if hasattr(U, "aula_id") and aula_id is not None:
+        pendientes = pendientes.where(U.aula_id == aula_id)
+    por_grupo = {}
+    for usuario_id, grupo in db.execute(pendientes.order_by(U.id).limit(limite)):
+        por_grupo.setdefault(grupo, []).append(usuario_id)
 
-    ahora = datetime.now()
-    hoy = ahora.date().isoformat()
-    aula_id = getattr(usuario, "aula_id", None)
+    marca = datetime.now().replace(microsecond=0)  # DATETIME de MySQL no guarda microsegundos
+    total = 0
+    for grupo, ids in por_grupo.items():
+        estudiantes = select(
+            U.id,
+            literal("Estudiante", A.rol.type),
+            literal("Entrada", A.tipo.type),
+            literal(hoy, A.fecha.type),
+            literal(ahora.time().strftime("%H:%M:%S"), A.hora.type),
+            literal("Ausente", A.estado.type),
+            literal(aula_id, A.aula_id.type),
+            literal(marca, A.created_at.type),
+        ).where(U.id.in_(ids))
+        # IGNORE: si un estudiante marca justo a la vez, la clave única descarta su fila aquí
+        n = db.execute(
+            insert(A).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite").from_select(
+                ["usuario_id", "rol", "tipo", "fecha", "hora", "estado", "aula_id", "created_at"],
+                estudiantes
+            )
+        ).rowcount
+        if n:
+            contadores.registrar(db, hoy, aula_id, "Estudiante", "Entrada", "Ausente", n, grupo)
+            total += n
+    return total
 
-    # Consulta registros de hoy
-    entrada_hoy = db.query(models.Asistencia).filter(
-        models.Asistencia.usuario_id == usuario.id,
-        models.Asistencia.fecha == hoy,
-        models.Asistencia.tipo == "Entrada"
-    ).first()
-    salida_hoy = db.query(models.Asistencia).filter(
-        models.Asistencia.usuario_id == usuario.id,
-        models.Asistencia.fecha == hoy,
-        models.Asistencia.tipo == "Salida"
-    ).first()
+class QRAsistencia(BaseModel):
+    qr_texto: str
 
+def decidir_marcaje(db: Session, usuario, ahora, tiene_entrada, tiene_salida, aula_id):
+    """
+    Reglas del marcaje por QR. Devuelve (tipo, estado) o lanza HTTPException.
+    Abre la ventana del aula cuando entra el docente y la cierra cuando sale
+    (los ausentes los registra después el planificador, ver cerrar_ventanas_vencidas).
+    """
     # Si es docente y ya tiene entrada y no tiene salida → registra salida
-    if usuario.rol == "Docente" and entrada_hoy and not salida_hoy:
-        nueva = models.Asistencia(
-            usuario_id=usuario.id,
-            rol="Docente",
-            tipo="Salida",
-            fecha=hoy,
-            hora=ahora.time().strftime("%H:%M:%S"),
-            estado="Cumplió horario",
-            aula_id=aula_id
-        )
-        db.add(nueva)
-        VENTANAS_ACTIVAS.pop(aula_id, None)
-        estudiantes_q = db.query(models.Usuario).filter(models.Usuario.rol == "Estudiante")
-        if hasattr(models.Usuario, "aula_id") and aula_id is not None:
-            estudiantes_q = estudiantes_q.filter(models.Usuario.aula_id == aula_id)
-        estudiantes = estudiantes_q.all()
-        for est in estudiantes:
-            existe = db.query(models.Asistencia).filter(
-                models.Asistencia.usuario_id == est.id,
-                models.Asistencia.fecha == hoy,
-                models.Asistencia.tipo == "Entrada"
-            ).first()
-            if not existe:
-                db.add(models.Asistencia(
-                    usuario_id=est.id,
-                    rol="Estudiante",
-                    tipo="Entrada",
-                    fecha=hoy,
-                    hora=ahora.time().strftime("%H:%M:%S"),
-                    estado="Ausente",
-                    aula_id=aula_id
-                ))
-        db.commit()
-        db.refresh(nueva)
-        return {"asistencia": {"id": nueva.id, "usuario_id": nueva.usuario_id, "rol": nueva.rol,
-                               "tipo": nueva.tipo, "fecha": nueva.fecha, "hora": nueva.hora, "estado": nueva.estado}}
+    if usuario.rol == "Docente" and tiene_entrada and not tiene_salida:
+        ESTADO.cerrar_ventana(db, aula_id, ahora)
+        return "Salida", "Cumplió horario"
 
     # Control de duplicados de entrada
-    if entrada_hoy:
+    if tiene_entrada:
         raise HTTPException(status_code=409, detail="Ya existe un registro de entrada para este usuario hoy")
 
     # Lógica de ventana y estado
     if usuario.rol == "Docente":
         # Abre ventana para estudiantes y fija tolerancia de tardanza
-        VENTANAS_ACTIVAS[aula_id] = {
-            "fin": ahora + timedelta(minutes=VENTANA_MIN),
-            "tardanza": ahora + timedelta(minutes=TARDANZA_EST_MIN),
-            "inicio": ahora
-        }
-        tipo = "Entrada"
-        estado = "A tiempo"  # Docente siempre “A tiempo” al entrar
-    elif usuario.rol == "Estudiante":
-        ventana = VENTANAS_ACTIVAS.get(aula_id)
-        if not ventana or ahora > ventana["fin"]:
+        ESTADO.abrir_ventana(
+            db, aula_id,
+            inicio=ahora,
+            fin=ahora + timedelta(minutes=VENTANA_MIN),
+            tardanza=ahora + timedelta(minutes=TARDANZA_EST_MIN)
+        )
+        return "Entrada", "A tiempo"  # Docente siempre “A tiempo” al entrar
+    if usuario.rol == "Estudiante":
+        ventana = ESTADO.obtener_ventana(db, aula_id)
+        if not ventana or not ventana["inicio"] <= ahora <= ventana["fin"]:
             raise HTTPException(status_code=403, detail="Ventana de marcaje no activa(Profesor, faltante)")
-        tipo = "Entrada"
-        estado = "A tiempo" if ahora <= ventana["tardanza"] else "Tarde"
-    else:
-        raise HTTPException(status_code=403, detail="Rol no permitido")
+        return "Entrada", "A tiempo" if ahora <= ventana["tardanza"] else "Tarde"
+    raise HTTPException(status_code=403, detail="Rol no permitido")
+
+def marcados_hoy(db: Session, usuario_id, hoy):
+    """Tipos ("Entrada"/"Salida") ya registrados por el usuario en la fecha, en una consulta."""
+    return {
+        tipo for (tipo,) in db.query(models.Asistencia.tipo).filter(
+            models.Asistencia.usuario_id == usuario_id,
+            models.Asistencia.fecha == hoy
+        )
+    }
+
+def insertar_o_409(db: Session, asistencia):
+    """
+    Inserta la asistencia (flush) y convierte la violación de la clave única
+    (usuario_id, fecha, tipo) en 409: así dos escaneos simultáneos no crean dos filas.
+    """
+    db.add(asistencia)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Ya existe un registro de {asistencia.tipo.lower()} para este usuario hoy"
+        )
 
+#----------------- ESCRITURA AGRUPADA (group commit) ------------------
+# ESCRITURA_GRUPAL=1: las entradas de estudiantes se confirman en lotes (ver escritura_grupal.py)
+ESCRITURA_GRUPAL = os.getenv("ESCRITURA_GRUPAL", "0") == "1"
+ESCRITURA_GRUPAL_MAX_FILAS = int(os.getenv("ESCRITURA_GRUPAL_MAX_FILAS", "200"))
+ESCRITURA_GRUPAL_ESPERA_MS = float(os.getenv("ESCRITURA_GRUPAL_ESPERA_MS", "5"))
+
+def insertar_asistencias(db: Session, filas):
+    """INSERT multi-fila + contadores; devuelve los ids en el orden de `filas` (sin commit)."""
+    db.execute(insert(models.Asistencia), filas)
+    grupos = dict(db.query(models.Usuario.id, models.Usuario.grupo).filter(
+        models.Usuario.id.in_({f["usuario_id"] for f in filas})
+    ))
+    conteo = Counter(
+        (f["fecha"], f["aula_id"], f["rol"], f["tipo"], f["estado"], grupos.get(f["usuario_id"])) for f in filas
+    )
+    for (fecha, aula_id, rol, tipo, estado, grupo), n in conteo.items():
+        contadores.registrar(db, fecha, aula_id, rol, tipo, estado, n, grupo)
+    # MySQL no tiene RETURNING: los ids se recuperan por la clave única (usuario_id, fecha, tipo)
+    ids = {
+        (usuario_id, str(fecha), tipo): id_
+        for id_, usuario_id, fecha, tipo in db.query(
+            models.Asistencia.id, models.Asistencia.usuario_id, models.Asistencia.fecha, models.Asistencia.tipo
+        ).filter(
+            models.Asistencia.usuario_id.in_({f["usuario_id"] for f in filas}),
+            models.Asistencia.fecha.in_({f["fecha"] for f in filas}),
+            models.Asistencia.tipo.in_({f["tipo"] for f in filas})
+        )
+    }
+    return [ids[(f["usuario_id"], f["fecha"], f["tipo"])] for f in filas]
+
+ESCRITOR = EscritorGrupal(
+    SessionLocal, insertar_asistencias,
+    max_filas=ESCRITURA_GRUPAL_MAX_FILAS, espera_ms=ESCRITURA_GRUPAL_ESPERA_MS,
+    al_confirmar=lambda db: tocar_tablas(db, "asistencias")
+) if ESCRITURA_GRUPAL else None
+if ESCRITOR is not None:
+    # Tamaño y duración de cada lote en /metrics
+    ESCRITOR.agregar_observador(metricas.METRICAS.registrar_lote)
+
+def encolar_entrada(db: Session, usuario, ahora, hoy, aula_id, estado):
+    """Encola la entrada ya validada de un estudiante; la respuesta sale cuando su lote es durable."""
+    db.commit()  # libera la conexión de la petición mientras espera el lote
+    fila = {
+        "usuario_id": usuario.id, "rol": usuario.rol, "tipo": "Entrada", "fecha": hoy,
+        "hora": ahora.time().strftime("%H:%M:%S"), "estado": estado,
+        "aula_id": aula_id, "created_at": ahora
+    }
+
+    def responder(id_insertado):
+        publicar_evento("asistencia", {**fila, "id": id_insertado}, usuario.grupo)
+        return {"asistencia": {
+            "id": id_insertado, "usuario_id": usuario.id, "nombre": usuario.nombre,
+            "cedula": usuario.cedula, "rol": usuario.rol, "tipo": "Entrada",
+            "fecha": hoy, "hora": fila["hora"], "estado": estado
+        }}
+
+    return EscrituraPendiente(
+        ESCRITOR.enviar(fila), responder,
+        HTTPException(status_code=409, detail="Ya existe un registro de entrada para este usuario hoy")
+    )
+
+@app.get("/api/status/escritura")
+def estado_escritura():
+    # Tamaño de lotes y latencia de volcado del escritor agrupado
+    if ESCRITOR is None:
+        return {"activo": False}
+    return {"activo": True, **ESCRITOR.estadisticas()}
+
+# Registrar asistencia desde QR
+@con_db(app.post("/api/asistencias/qr"))
+def registrar_asistencia_qr(body: QRAsistencia, db: Session = Depends(get_db)):
+    cedula, _ = extraer_info(body.qr_texto)
+    cedula = normalizar_cedula(cedula)
+
+    usuario = buscar_usuario_por_cedula(db, cedula)
+    if not usuario:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    ahora = datetime.now()
+    hoy = ahora.date().isoformat()
+    aula_id = getattr(usuario, "aula_id", None)
+
+    # El estudiante solo puede marcar Entrada: se inserta directamente y la clave única
+    # (usuario_id, fecha, tipo) detecta el duplicado. El docente necesita saber si ya
+    # entró para decidir entre Entrada y Salida: una sola consulta trae ambas.
+    marcados = marcados_hoy(db, usuario.id, hoy) if usuario.rol == "Docente" else set()
+
+    tipo, estado = decidir_marcaje(db, usuario, ahora, "Entrada" in marcados, "Salida" in marcados, aula_id)
+    if ESCRITOR is not None and usuario.rol == "Estudiante":
+        return encolar_entrada(db, usuario, ahora, hoy, aula_id, estado)
     nueva = models.Asistencia(
         usuario_id=usuario.id,
         rol=usuario.rol,
@@ -300,17 +733,148 @@ def registrar_asistencia_qr(body: QRAsistencia, db: Session = Depends(get_db)):
         estado=estado,
         aula_id=aula_id
     )
-    db.add(nueva)
+    insertar_o_409(db, nueva)
+    contadores.registrar(db, hoy, aula_id, usuario.rol, tipo, estado, grupo=usuario.grupo)
     db.commit()
+    tocar_tablas(db, "asistencias")
     db.refresh(nueva)
+    publicar_evento("asistencia", nueva, usuario.grupo)
+    if tipo == "Salida":
+        return {"asistencia": {"id": nueva.id, "usuario_id": nueva.usuario_id, "rol": nueva.rol,
+                               "tipo": nueva.tipo, "fecha": nueva.fecha, "hora": nueva.hora, "estado": nueva.estado}}
     return {"asistencia": {
         "id": nueva.id, "usuario_id": nueva.usuario_id, "nombre": usuario.nombre,
         "cedula": usuario.cedula, "rol": nueva.rol, "tipo": nueva.tipo,
         "fecha": nueva.fecha, "hora": nueva.hora, "estado": nueva.estado
     }}
 
+#----------------- REGISTRO DE QR EN LOTE (escáneres con buffer) ------------------
+LOTE_REINTENTOS = 3
+
+class QRLoteItem(BaseModel):
+    qr_texto: str
+    scanned_at: datetime | None = None  # hora real del escaneo; si falta se usa la de llegada
+    device_id: str | None = None
+
+@con_db(app.post("/api/asistencias/qr/batch"))
+def registrar_asistencias_qr_lote(items: list[QRLoteItem], db: Session = Depends(get_db)):
+    """
+    Procesa el backlog de un escáner en una sola transacción, en orden de escaneo:
+    una consulta para todas las cédulas, otra para las entradas/salidas ya existentes
+    y un INSERT multi-fila. Devuelve un resultado por item (en el orden recibido).
+    Un escaneo dentro de la ventana de un estudiante ya marcado "Ausente" corrige esa entrada.
+    """
+    recibido = datetime.now()
+    resultados = [None] * len(items)
+    pendientes = []  # (indice, cedula, ahora, device_id)
+    for i, item in enumerate(items):
+        try:
+            cedula, _ = extraer_info(item.qr_texto)
+        except ValueError:
+            resultados[i] = {"indice": i, "ok": False, "status": 400, "detail": "QR inválido"}
+            continue
+        ahora = item.scanned_at or recibido
+        if ahora.tzinfo is not None:
+            ahora = ahora.astimezone().replace(tzinfo=None)
+        pendientes.append((i, normalizar_cedula(cedula), ahora, item.device_id))
+
+    # Si otra petición inserta la misma (usuario, fecha, tipo) entre la lectura y el INSERT,
+    # la clave única aborta el lote: se reprocesa con el estado actualizado
+    for _ in range(LOTE_REINTENTOS):
+        try:
+            procesados, eventos = _procesar_lote(db, pendientes, recibido)
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+    else:
+        raise HTTPException(status_code=409, detail="Conflicto al registrar el lote, reintente")
+    if eventos:
+        tocar_tablas(db, "asistencias")
+    for i, resultado in procesados.items():
+        resultados[i] = resultado
+    for evento in eventos:
+        BUS.publicar(evento)
+    registrados = sum(1 for r in resultados if r["ok"])
+    return {"resultados": resultados, "registrados": registrados, "rechazados": len(resultados) - registrados}
+
+def _procesar_lote(db: Session, pendientes, recibido):
+    """Aplica las reglas a los items decodificados; devuelve ({indice: resultado}, eventos)."""
+    # 1 consulta: todas las cédulas del lote
+    cedulas = {cedula for _, cedula, _, _ in pendientes}
+    usuarios = {
+        fila.cedula: UsuarioQR(*fila)
+        for fila in db.query(models.Usuario.id, models.Usuario.rol, models.Usuario.nombre,
+                             models.Usuario.cedula, models.Usuario.activo, models.Usuario.grupo)
+        .filter(models.Usuario.cedula.in_(cedulas))
+    } if cedulas else {}
+
+    # 1 consulta: entradas/salidas ya registradas de esos usuarios en esas fechas
+    ids = {u.id for u in usuarios.values()}
+    fechas = {ahora.date() for _, _, ahora, _ in pendientes}
+    marcados = {
+        (fila.usuario_id, str(fila.fecha), fila.tipo): fila._asdict()
+        for fila in db.query(
+            models.Asistencia.id, models.Asistencia.usuario_id, models.Asistencia.fecha,
+            models.Asistencia.tipo, models.Asistencia.estado, models.Asistencia.aula_id
+        ).filter(models.Asistencia.usuario_id.in_(ids), models.Asistencia.fecha.in_(fechas))
+    } if ids else {}
+
+    filas = []
+    conteo = Counter()
+    eventos = []  # se publican después del commit
+    resultados = {}
+    for i, cedula, ahora, device_id in sorted(pendientes, key=lambda p: p[2]):
+        usuario = usuarios.get(cedula)
+        if not usuario:
+            resultados[i] = {"indice": i, "ok": False, "status": 404, "detail": "Usuario no encontrado"}
+            continue
+        hoy = ahora.date().isoformat()
+        aula_id = getattr(usuario, "aula_id", None)
+        entrada = marcados.get((usuario.id, hoy, "Entrada"))
+        # Escáner atrasado: el planificador ya marcó "Ausente" a un estudiante que sí escaneó
+        # dentro de la ventana; esa entrada se corrige en lugar de rechazar el item
+        tardio = usuario.rol == "Estudiante" and entrada is not None and entrada["estado"] == "Ausente"
+        try:
+            tipo, estado = decidir_marcaje(
+                db, usuario, ahora,
+                entrada is not None and not tardio,
+                (usuario.id, hoy, "Salida") in marcados,
+                aula_id
+            )
+        except HTTPException as e:
+            if tardio:
+                e = HTTPException(status_code=409, detail="Ya existe un registro de entrada para este usuario hoy")
+            resultados[i] = {"indice": i, "ok": False, "status": e.status_code, "detail": e.detail}
+            continue
+        fila = {
+            "usuario_id": usuario.id, "rol": usuario.rol, "tipo": tipo, "fecha": hoy,
+            "hora": ahora.time().strftime("%H:%M:%S"), "estado": estado,
+            "aula_id": aula_id, "device_id": device_id, "created_at": recibido
+        }
+        if tardio:
+            fila["aula_id"] = entrada["aula_id"]
+            db.query(models.Asistencia).filter(models.Asistencia.id == entrada["id"]).update(
+                {c: fila[c] for c in ("hora", "estado", "device_id", "created_at")}, synchronize_session=False)
+            contadores.cambiar_estado(db, hoy, entrada["aula_id"], usuario.rol, tipo, "Ausente", estado,
+                                      usuario.grupo)
+            eventos.append(evento_asistencia("estado", {**fila, "id": entrada["id"]}, usuario.grupo))
+        else:
+            filas.append(fila)
+            conteo[(hoy, aula_id, usuario.rol, tipo, estado, usuario.grupo)] += 1
+            eventos.append(evento_asistencia("asistencia", fila, usuario.grupo))
+        marcados[(usuario.id, hoy, tipo)] = fila
+        resultados[i] = {"indice": i, "ok": True, "usuario_id": usuario.id, "nombre": usuario.nombre,
+                         "rol": usuario.rol, "tipo": tipo, "fecha": hoy,
+                         "hora": ahora.time().strftime("%H:%M:%S"), "estado": estado}
+    if filas:
+        db.execute(insert(models.Asistencia), filas)
+    for (hoy, aula_id, rol, tipo, estado, grupo), n in conteo.items():
+        contadores.registrar(db, hoy, aula_id, rol, tipo, estado, n, grupo)
+    return resultados, eventos
+
 #----------------- MARCAR SALIDA PROFESOR Y ACTUALIZAR ESTUDIANTES AUSENTES ------------------
-@app.post("/api/profesor/salida")
+@con_db(app.post("/api/profesor/salida"))
 def marcar_salida_profesor(aula_id: int = Body(...), profesor_cedula: str = Body(...), db: Session = Depends(get_db)):
     profesor_q = db.query(models.Usuario).filter(
         models.Usuario.cedula == profesor_cedula,
@@ -322,16 +886,7 @@ def marcar_salida_profesor(aula_id: int = Body(...), profesor_cedula: str = Body
     if not profesor:
         raise HTTPException(status_code=404, detail="Profesor no encontrado")
 
-    hoy = datetime.date.today().isoformat()
-    salida_hoy = db.query(models.Asistencia).filter(
-        models.Asistencia.usuario_id == profesor.id,
-        models.Asistencia.fecha == hoy,
-        models.Asistencia.tipo == "Salida"
-    ).first()
-    if salida_hoy:
-        raise HTTPException(status_code=409, detail="Ya existe un registro de salida para este profesor hoy")
-
-    ahora = datetime.datetime.now()
+    ahora = datetime.now()
 
     # Registra la salida del profesor
     nueva = models.Asistencia(
@@ -343,80 +898,281 @@ def marcar_salida_profesor(aula_id: int = Body(...), profesor_cedula: str = Body
         estado="Cumplió horario",
         aula_id=aula_id
     )
+    # La clave única (usuario_id, fecha, tipo) rechaza una segunda salida del día
     db.add(nueva)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Ya existe un registro de salida para este profesor hoy")
+    contadores.registrar(db, nueva.fecha, aula_id, "Docente", "Salida", "Cumplió horario", grupo=profesor.grupo)
 
-    # Marca como "Ausente" a los estudiantes del aula que no registraron entrada hoy
-    hoy = ahora.date().isoformat()
-    estudiantes_q = db.query(models.Usuario).filter(models.Usuario.rol == "Estudiante")
-    if hasattr(models.Usuario, "aula_id") and aula_id is not None:
-        estudiantes_q = estudiantes_q.filter(models.Usuario.aula_id == aula_id)
-    estudiantes = estudiantes_q.all()
-    for est in estudiantes:
-        asistencia = db.query(models.Asistencia).filter(
-            models.Asistencia.usuario_id == est.id,
-            models.Asistencia.fecha == hoy,
-            models.Asistencia.tipo == "Entrada"
-        ).first()
-        if not asistencia:
-            nueva_ausente = models.Asistencia(
-                usuario_id=est.id,
-                rol="Estudiante",
-                tipo="Entrada",
-                fecha=hoy,
-                hora=ahora.time().strftime("%H:%M:%S"),
-                estado="Ausente",
-                aula_id=aula_id
-            )
-            db.add(nueva_ausente)
+    # Cierra la ventana: el planificador marca como "Ausente" a los estudiantes sin entrada
+    ESTADO.cerrar_ventana(db, aula_id, ahora)
 
     db.commit()
-    return {"mensaje": "Salida registrada y estudiantes ausentes actualizados"}
+    tocar_tablas(db, "asistencias")
+    db.refresh(nueva)
+    publicar_evento("asistencia", nueva, profesor.grupo)
+    return {"mensaje": "Salida registrada; los estudiantes ausentes se registran al cerrar la ventana"}
 
 #----------------- LISTAR ASISTENCIAS ------------------
-@app.get("/api/asistencias")
-def listar_asistencias(db: Session = Depends(get_db)):
-    registros = (
-        db.query(
-            models.Asistencia.id,
-            models.Asistencia.usuario_id,
+LIMITE_ASISTENCIAS = 100      # tamaño de página por defecto
+LIMITE_ASISTENCIAS_MAX = 1000 # tope para evitar respuestas gigantes
+
+def consulta_asistencias(A=models.Asistencia):
+    """Columnas de la vista de asistencias sobre la tabla activa o la de archivo (`A`)."""
+    return (
+        select(
+            A.id,
+            A.usuario_id,
             models.Usuario.nombre,
             models.Usuario.cedula,
             models.Usuario.rol,
             models.Usuario.grupo,
-            models.Asistencia.aula_id,
+            A.aula_id,
             models.Aula.aula,
-            models.Asistencia.tipo,
-            models.Asistencia.fecha,
-            models.Asistencia.hora,
-            models.Asistencia.estado
+            A.tipo,
+            A.fecha,
+            A.hora,
+            A.estado
         )
-        .join(models.Usuario, models.Asistencia.usuario_id == models.Usuario.id)
-        .outerjoin(models.Aula, models.Asistencia.aula_id == models.Aula.id)
-        .all()
+        .join(models.Usuario, A.usuario_id == models.Usuario.id)
+        .outerjoin(models.Aula, A.aula_id == models.Aula.id)
     )
-    return {"asistencias": [
-        {
-            "id": r.id,
-            "usuario_id": r.usuario_id,
-            "nombre": r.nombre,
-            "cedula": r.cedula,
-            "rol": r.rol,
-            "grupo": r.grupo,
-            "aula_id": r.aula_id,
-            "aula": r.aula,
-            "tipo": r.tipo,
-            "fecha": r.fecha,
-            "hora": r.hora,
-            "estado": r.estado
-        }
-        for r in registros
-    ]}
+
+def filtrar_asistencias(q, desde=None, hasta=None, rol=None, estado=None,
+                        aula_id=None, grupo=None, buscar=None, A=models.Asistencia):
+    """Aplica en SQL los filtros de la vista de asistencias (requiere JOIN con usuarios)."""
+    if desde:
+        q = q.filter(A.fecha >= desde)
+    if hasta:
+        q = q.filter(A.fecha <= hasta)
+    if rol:
+        q = q.filter(A.rol == rol)
+    if estado:
+        q = q.filter(A.estado == estado)
+    if aula_id is not None:
+        q = q.filter(A.aula_id == aula_id)
+    if grupo:
+        q = q.filter(models.Usuario.grupo == grupo)
+    if buscar:
+        patron = f"%{buscar}%"
+        q = q.filter(or_(models.Usuario.nombre.like(patron), models.Usuario.cedula.like(patron)))
+    return q
+
+@con_db(app.get("/api/asistencias"))
+def listar_asistencias(
+    request: Request,
+    desde: date | None = None,
+    hasta: date | None = None,
+    rol: str | None = None,
+    estado: str | None = None,
+    aula_id: int | None = None,
+    grupo: str | None = None,
+    buscar: str | None = None,
+    cursor: int | None = Query(None, description="id del último registro de la página anterior"),
+    limite: int = Query(LIMITE_ASISTENCIAS, ge=1, le=LIMITE_ASISTENCIAS_MAX),
+    db: Session = Depends(get_db)
+):
+    etag = etag_listado(db, request, "asistencias", "usuarios")
+    if (r := no_modificado(request, etag)) is not None:
+        return r
+    def pagina(A):
+        q = filtrar_asistencias(consulta_asistencias(A), desde, hasta, rol, estado, aula_id, grupo, buscar, A=A)
+        # Paginación por cursor (keyset): la página N cuesta lo mismo que la primera
+        if cursor is not None:
+            q = q.filter(A.id < cursor)
+        # Se pide un registro extra para saber si hay más páginas sin hacer COUNT(*)
+        return q.order_by(A.id.desc()).limit(limite + 1)
+
+    q = pagina(models.Asistencia)
+    if incluir_archivo(db, desde, hasta):
+        # El rango pide periodos archivados: la página sale de ambas tablas (cada una usa su índice)
+        union = union_all(*(select(pagina(A).subquery()) for A in (models.Asistencia, models.AsistenciaArchivo))).subquery()
+        q = select(union).order_by(union.c.id.desc()).limit(limite + 1)
+    registros = db.execute(q).all()
+    has_more = len(registros) > limite
+    registros = registros[:limite]
+    return RespuestaJSON({
+        "asistencias": [r._asdict() for r in registros],
+        "has_more": has_more,
+        "siguiente_cursor": registros[-1].id if has_more else None
+    }, headers=cabeceras_etag(etag))
+
+#----------------- EXPORTAR ASISTENCIAS (streaming) ------------------
+EXPORT_LOTE = 1000  # filas por lote del cursor del servidor y por bloque enviado al cliente
+EXPORT_COLUMNAS = ["id", "usuario_id", "nombre", "cedula", "rol", "grupo", "aula_id", "aula",
+                   "tipo", "fecha", "hora", "estado"]
+
+def _filas_export(filtros):
+    """Recorre las asistencias con un cursor del lado del servidor (memoria constante)."""
+    # Sesión propia: la del Depends se cerraría antes de terminar de enviar la respuesta
+    db = SessionLocal()
+    try:
+        # Primero lo archivado (ids más antiguos) si el rango lo pide, luego la tabla activa
+        tablas = [models.Asistencia]
+        if incluir_archivo(db, filtros["desde"], filtros["hasta"]):
+            tablas.insert(0, models.AsistenciaArchivo)
+        for A in tablas:
+            q = filtrar_asistencias(consulta_asistencias(A), **filtros, A=A).order_by(A.id)
+            resultado = db.execute(q.execution_options(yield_per=EXPORT_LOTE))
+            for lote in resultado.partitions():
+                yield lote
+    finally:
+        db.close()
+
+def _export_csv(filtros):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(EXPORT_COLUMNAS)
+    yield buffer.getvalue()
+    for lote in _filas_export(filtros):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(lote)
+        yield buffer.getvalue()
+
+def _export_ndjson(filtros):
+    for lote in _filas_export(filtros):
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNAS, fila)), default=str, ensure_ascii=False) + "\n"
+            for fila in lote
+        )
+
+@app.get("/api/asistencias/export")
+def exportar_asistencias(
+    formato: str = Query("csv", pattern="^(csv|ndjson)$"),
+    desde: date | None = None,
+    hasta: date | None = None,
+    rol: str | None = None,
+    estado: str | None = None,
+    aula_id: int | None = None,
+    grupo: str | None = None,
+    buscar: str | None = None
+):
+    filtros = dict(desde=desde, hasta=hasta, rol=rol, estado=estado,
+                   aula_id=aula_id, grupo=grupo, buscar=buscar)
+    if formato == "csv":
+        contenido, media_type = _export_csv(filtros), "text/csv; charset=utf-8"
+    else:
+        contenido, media_type = _export_ndjson(filtros), "application/x-ndjson"
+    nombre = f"asistencias_{desde or 'inicio'}_{hasta or 'hoy'}.{formato}"
+    return StreamingResponse(contenido, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{nombre}"'})
+
+#----------------- RESUMEN DEL DASHBOARD ------------------
+@con_db(app.get("/api/dashboard/resumen"))
+def resumen_dashboard(fecha: date | None = None, aula_id: int | None = None, rol: str | None = None,
+                      db: Session = Depends(get_db)):
+    # Lee los contadores incrementales (contadores.py), nunca la tabla de asistencias
+    return contadores.resumen(db, fecha or date.today(), aula_id, rol)
+
+#----------------- REPORTES (asistencias_resumen) ------------------
+@con_db(app.get("/api/reportes/asistencia"))
+def reporte_asistencia(
+    desde: date,
+    hasta: date | None = None,
+    agrupar: str = Query("grupo", description="fecha, semana, grupo, aula o rol"),
+    rol: str | None = None,
+    grupo: str | None = None,
+    aula_id: int | None = None,
+    db: Session = Depends(get_db)
+):
+    """Asistencia (%) y puntualidad (%) del periodo, leídas de la tabla de resumen."""
+    if agrupar not in contadores.AGRUPACIONES:
+        raise HTTPException(status_code=400, detail=f"agrupar debe ser uno de: {', '.join(contadores.AGRUPACIONES)}")
+    return contadores.reporte(db, desde, hasta or date.today(), agrupar, rol, grupo, aula_id)
+
+#----------------- PLANIFICADOR: VENTANAS VENCIDAS Y PURGA ------------------
+def cerrar_ventanas_vencidas(db: Session):
+    """
+    Registra los ausentes de las ventanas cerradas por el docente o vencidas por tiempo
+    (docente que olvidó marcar salida), en lotes de AUSENTES_LOTE con un commit cada uno.
+    """
+    ventanas = ESTADO.ventanas_vencidas(db, datetime.now())
+    total = 0
+    for aula_id, ventana in ventanas:
+        hoy = ventana["inicio"].date().isoformat()
+        ausentes = 0
+        while n := marcar_ausentes(db, hoy, ventana["fin"], aula_id):
+            db.commit()
+            ausentes += n
+        ESTADO.marcar_procesada(db, aula_id, ventana)
+        db.commit()
+        if ausentes:
+            tocar_tablas(db, "asistencias")
+            BUS.publicar(evento_ausentes(hoy, aula_id, ausentes))
+        total += ausentes
+    return {"ventanas": len(ventanas), "ausentes": total}
+
+def purgar_estado(db: Session):
+    """Borra ventanas y entradas de ESTADO ya caducadas: la memoria no crece con los días."""
+    purgadas = ESTADO.purgar(db)
+    db.commit()
+    return {"purgadas": purgadas}
+
+PLANIFICADOR = Planificador(SessionLocal)
+PLANIFICADOR.agregar("ventanas", cerrar_ventanas_vencidas)
+PLANIFICADOR.agregar("purga", purgar_estado)
+
+@app.get("/api/status/planificador")
+def estado_planificador():
+    return PLANIFICADOR.estado()
+
+#----------------- ARCHIVADO DE PERIODOS CERRADOS ------------------
+ARCHIVADOR = Archivador(SessionLocal, al_confirmar=lambda db: tocar_tablas(db, "asistencias", "justificantes"))
+
+@app.post("/api/archivo", status_code=202)
+def archivar_periodo(tareas: BackgroundTasks, hasta: date = Body(..., embed=True)):
+    """
+    Mueve por lotes a las tablas de archivo todo lo anterior a `hasta` (día 1 de un mes).
+    Los listados y la exportación lo siguen mostrando cuando `desde` cae en el archivo.
+    """
+    if not corte_valido(hasta):
+        raise HTTPException(status_code=400, detail="hasta debe ser el día 1 de un mes anterior o igual al actual")
+    if not ARCHIVADOR.iniciar(hasta):
+        raise HTTPException(status_code=409, detail="Ya hay un archivado en curso")
+    tareas.add_task(ARCHIVADOR.ejecutar, hasta)
+    return ARCHIVADOR.estado()
+
+@app.get("/api/archivo")
+def progreso_archivo():
+    return ARCHIVADOR.estado()
+
+#----------------- SNAPSHOTS PARQUET (análisis fuera de línea) ------------------
+SNAPSHOT = TrabajoSnapshot(SessionLocal)
+
+@app.post("/api/snapshots/asistencias", status_code=202)
+def generar_snapshot(tareas: BackgroundTasks, rehacer_desde: date | None = None):
+    """Exporta en segundo plano los días nuevos a Parquet (ver snapshots.py)."""
+    estado = SNAPSHOT.estado()
+    if not estado["disponible"]:
+        raise HTTPException(status_code=503, detail="pyarrow no está instalado en el servidor")
+    if not SNAPSHOT.iniciar():
+        raise HTTPException(status_code=409, detail="Ya hay una exportación en curso")
+    tareas.add_task(SNAPSHOT.ejecutar, rehacer_desde)
+    return {"iniciado": True, **estado}
+
+@app.get("/api/snapshots/asistencias")
+def estado_snapshot():
+    return SNAPSHOT.estado()
 
 @app.delete("/api/asistencias/all")
 def eliminar_todos_registros(db: Session = Depends(get_db)):
+    # Solo la tabla activa: lo archivado (y sus archivos adjuntos) se conserva
+    adjuntos = {sha for sha, in db.query(models.Justificante.archivo_sha256).filter(
+        models.Justificante.archivo_sha256.isnot(None)).distinct()}
+    primera, ultima = db.query(func.min(models.Asistencia.fecha), func.max(models.Asistencia.fecha)).one()
     db.query(models.Asistencia).delete()
     db.query(models.Justificante).delete()
+    # Los contadores de las fechas borradas se recalculan: quedan solo los del archivo
+    if primera is not None:
+        contadores.reconstruir(db, primera, ultima)
     db.commit()
+    for sha in adjuntos:
+        borrar_archivo_si_huerfano(db, sha)
+    tocar_tablas(db, "asistencias", "justificantes")
     return {"success": True, "mensaje": "Todos los registros eliminados"}
 
 class AsistenciaUpdate(BaseModel):
@@ -428,34 +1184,43 @@ def actualizar_asistencia(id: int = Path(...), body: AsistenciaUpdate = Body(...
     if not reg:
         raise HTTPException(status_code=404, detail="Asistencia no encontrada")
     if body.estado:
+        contadores.cambiar_estado(db, reg.fecha, reg.aula_id, reg.rol, reg.tipo, reg.estado, body.estado,
+                                  reg.usuario.grupo if reg.usuario else None)
         reg.estado = body.estado
     db.commit()
+    tocar_tablas(db, "asistencias")
     db.refresh(reg)
+    publicar_evento("estado", reg, reg.usuario.grupo if reg.usuario else None)
     return {"asistencia": {
         "id": reg.id, "usuario_id": reg.usuario_id, "rol": reg.rol,
         "tipo": reg.tipo, "fecha": reg.fecha, "hora": reg.hora, "estado": reg.estado
     }}
 
 #----------------- LISTAR JUSTIFICANTES ------------------
-@app.get("/api/justificantes")
-def listar_justificantes(db: Session = Depends(get_db)):
-    from models import Justificante, Usuario
-    justs = (
-        db.query(Justificante, Usuario)
-        .join(Usuario, Justificante.usuario_id == Usuario.id)
-        .all()
-    )
-    return {"justificantes": [
-        {
-            "id": j.id,
-            "asistencia_id": j.asistencia_id,
-            "usuario_id": j.usuario_id,
-            "nombre": u.nombre,  # <-- nombre del estudiante
-            "fecha_registro": str(j.fecha_registro),
-            "fecha_documento": str(j.fecha_documento),
-            "motivo": j.motivo
-        } for j, u in justs
-    ]}
+@con_db(app.get("/api/justificantes"))
+def listar_justificantes(request: Request, db: Session = Depends(get_db)):
+    etag = etag_listado(db, request, "justificantes", "usuarios")
+    if (r := no_modificado(request, etag)) is not None:
+        return r
+    from models import Justificante, JustificanteArchivo, Usuario
+    # Activos y archivados: los de periodos cerrados se siguen pudiendo consultar
+    consultas = [
+        select(
+            J.id,
+            J.asistencia_id,
+            J.usuario_id,
+            Usuario.nombre,  # <-- nombre del estudiante
+            J.fecha_registro,
+            J.fecha_documento,
+            J.motivo,
+            J.archivo_nombre,
+            literal(J is JustificanteArchivo).label("archivado")
+        )
+        .join(Usuario, J.usuario_id == Usuario.id)
+        for J in (Justificante, JustificanteArchivo)
+    ]
+    justs = db.execute(union_all(*consultas)).all()
+    return RespuestaJSON({"justificantes": [j._asdict() for j in justs]}, headers=cabeceras_etag(etag))
 
 from pydantic import BaseModel
 
@@ -481,9 +1246,16 @@ def crear_justificante(body: JustificanteCreate, db: Session = Depends(get_db)):
     # Actualiza el estado de la asistencia a "Justificado"
     asistencia = db.query(models.Asistencia).filter(models.Asistencia.id == body.asistencia_id).first()
     if asistencia:
+        contadores.cambiar_estado(db, asistencia.fecha, asistencia.aula_id, asistencia.rol,
+                                  asistencia.tipo, asistencia.estado, "Justificado",
+                                  asistencia.usuario.grupo if asistencia.usuario else None)
         asistencia.estado = "Justificado"
     db.commit()
+    tocar_tablas(db, "asistencias", "justificantes")
     db.refresh(nuevo)
+    if asistencia:
+        publicar_evento("justificante", asistencia, asistencia.usuario.grupo if asistencia.usuario else None,
+                        justificante_id=nuevo.id)
     return {"justificante": {
         "id": nuevo.id,
         "asistencia_id": nuevo.asistencia_id,
@@ -493,9 +1265,89 @@ def crear_justificante(body: JustificanteCreate, db: Session = Depends(get_db)):
         "motivo": nuevo.motivo
     }}
 
+# ------------------ JUSTIFICANTES POR RANGO DE FECHAS ------------------
+ESTADOS_JUSTIFICABLES = ("Ausente", "Tarde")
+
+class JustificanteRango(BaseModel):
+    usuario_id: int
+    desde: date
+    hasta: date
+    motivo: str
+    fecha_documento: date | None = None
+    referencia: str | None = Field(None, max_length=50)  # justificantes.referencia es VARCHAR(50)
+
+@app.post("/api/justificantes/lote")
+def crear_justificantes_rango(body: JustificanteRango, db: Session = Depends(get_db)):
+    """
+    Justifica todas las ausencias y tardanzas de un usuario en [desde, hasta]
+    (p. ej. una incapacidad de una semana) en una sola transacción:
+    1 SELECT de las asistencias, 1 INSERT multi-fila de justificantes y 1 UPDATE de estados.
+    Las asistencias del rango que no se justifican vuelven en `omitidas` con el motivo.
+    """
+    if body.hasta < body.desde:
+        raise HTTPException(status_code=400, detail="hasta debe ser posterior a desde")
+    usuario = db.query(models.Usuario.id, models.Usuario.grupo).filter(models.Usuario.id == body.usuario_id).first()
+    if not usuario:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    A = models.Asistencia
+    # FOR UPDATE: otra petición no puede cambiar el estado entre la lectura y el UPDATE
+    # (los contadores se ajustan con el estado leído aquí)
+    en_rango = db.query(A.id, A.fecha, A.aula_id, A.rol, A.tipo, A.estado, A.hora).filter(
+        A.usuario_id == body.usuario_id,
+        A.fecha >= body.desde, A.fecha <= body.hasta
+    ).order_by(A.fecha).with_for_update().all()
+    filas = [f for f in en_rango if f.estado in ESTADOS_JUSTIFICABLES]
+    omitidas = [
+        {"asistencia_id": f.id, "fecha": str(f.fecha), "motivo": f"estado '{f.estado}' no justificable"}
+        for f in en_rango if f.estado not in ESTADOS_JUSTIFICABLES
+    ]
+    AA = models.AsistenciaArchivo
+    omitidas += [
+        {"asistencia_id": id_, "fecha": str(fecha), "motivo": "archivada (periodo cerrado)"}
+        for id_, fecha in db.query(AA.id, AA.fecha).filter(
+            AA.usuario_id == body.usuario_id, AA.fecha >= body.desde, AA.fecha <= body.hasta
+        ).order_by(AA.fecha)
+    ]
+    if not filas:
+        return {"justificados": 0, "justificantes": [], "omitidas": omitidas}
+
+    fecha_documento = body.fecha_documento or date.today()
+    db.execute(insert(models.Justificante), [
+        {"asistencia_id": f.id, "usuario_id": body.usuario_id, "fecha_registro": f.fecha,
+         "fecha_documento": fecha_documento, "motivo": body.motivo, "referencia": body.referencia}
+        for f in filas
+    ])
+    ids_asistencia = [f.id for f in filas]
+    db.query(A).filter(A.id.in_(ids_asistencia)).update({A.estado: "Justificado"}, synchronize_session=False)
+    conteo = Counter((f.fecha, f.aula_id, f.rol, f.tipo, f.estado) for f in filas)
+    for (fecha, aula_id, rol, tipo, anterior), n in conteo.items():
+        contadores.cambiar_estado(db, fecha, aula_id, rol, tipo, anterior, "Justificado", usuario.grupo, n)
+    # MySQL no tiene RETURNING: los ids nuevos se leen por asistencia (el mayor es el recién creado)
+    justificantes = dict(db.query(models.Justificante.asistencia_id, func.max(models.Justificante.id)).filter(
+        models.Justificante.asistencia_id.in_(ids_asistencia)
+    ).group_by(models.Justificante.asistencia_id))
+    db.commit()
+    tocar_tablas(db, "asistencias", "justificantes")
+
+    for f in filas:
+        publicar_evento("justificante", {
+            "id": f.id, "usuario_id": body.usuario_id, "rol": f.rol, "tipo": f.tipo, "estado": "Justificado",
+            "fecha": f.fecha, "hora": f.hora, "aula_id": f.aula_id
+        }, usuario.grupo, justificante_id=justificantes.get(f.id))
+    return {"justificados": len(filas), "justificantes": [
+        {"id": justificantes.get(f.id), "asistencia_id": f.id, "fecha": str(f.fecha), "estado_anterior": f.estado}
+        for f in filas
+    ], "omitidas": omitidas}
+
 @app.get("/api/justificantes/{justificante_id}")
 def ver_justificante(justificante_id: int, db: Session = Depends(get_db)):
-    j = db.query(models.Justificante).filter(models.Justificante.id == justificante_id).first()
+    j = None
+    # Igual que la descarga del archivo: si no está en la tabla activa se busca en el archivo
+    for J in (models.Justificante, models.JustificanteArchivo):
+        j = db.query(J).filter(J.id == justificante_id).first()
+        if j:
+            break
     if not j:
         raise HTTPException(status_code=404, detail="Justificante no encontrado")
     # Si usas JOIN para nombre y rol, inclúyelos aquí
@@ -511,7 +1363,8 @@ def ver_justificante(justificante_id: int, db: Session = Depends(get_db)):
         "motivo": j.motivo,
         "referencia": j.referencia,
         "archivo_nombre": j.archivo_nombre,
-        "archivo_url": j.archivo_url
+        "archivo_url": j.archivo_url,
+        "archivado": isinstance(j, models.JustificanteArchivo)
     }
 
 @app.delete("/api/justificantes/{justificante_id}")
@@ -521,8 +1374,78 @@ def eliminar_justificante(justificante_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Justificante no encontrado")
     db.delete(j)
     db.commit()
+    tocar_tablas(db, "justificantes")
+    borrar_archivo_si_huerfano(db, j.archivo_sha256)
     return {"ok": True}
 
+#----------------- ARCHIVOS DE JUSTIFICANTES ------------------
+ARCHIVOS = AlmacenArchivos()
+
+def borrar_archivo_si_huerfano(db: Session, sha256):
+    """Borra el archivo si ningún justificante (activo o archivado) lo referencia."""
+    if not sha256:
+        return
+    for J in (models.Justificante, models.JustificanteArchivo):
+        if db.query(J.id).filter(J.archivo_sha256 == sha256).first():
+            return
+    ARCHIVOS.borrar(sha256)
+
+@app.post("/api/justificantes/{justificante_id}/archivo")
+def subir_archivo_justificante(justificante_id: int, request: Request, archivo: UploadFile = File(...),
+                               db: Session = Depends(get_db)):
+    """
+    Adjunta (o reemplaza) el archivo de un justificante. Endpoint síncrono a propósito:
+    la copia por bloques al almacén corre en el threadpool sin bloquear el event loop.
+    """
+    j = db.query(models.Justificante).filter(models.Justificante.id == justificante_id).first()
+    if not j:
+        raise HTTPException(status_code=404, detail="Justificante no encontrado")
+    if not tipo_permitido(archivo.content_type):
+        raise HTTPException(status_code=415, detail="Solo se aceptan PDF, PNG o JPEG")
+    try:
+        sha256, tamano = ARCHIVOS.guardar(archivo.file)
+    except ArchivoDemasiadoGrande:
+        raise HTTPException(status_code=413, detail=f"El archivo supera {ARCHIVOS.max_bytes // (1024 * 1024)} MB")
+
+    anterior = j.archivo_sha256
+    j.archivo_sha256 = sha256
+    j.archivo_nombre = (archivo.filename or "justificante")[:200]
+    j.archivo_mime = tipo_base(archivo.content_type)
+    j.archivo_url = str(request.url_for("descargar_archivo_justificante", justificante_id=j.id))
+    db.commit()
+    tocar_tablas(db, "justificantes")
+    if anterior != sha256:
+        borrar_archivo_si_huerfano(db, anterior)
+    return {"archivo": {"nombre": j.archivo_nombre, "mime": j.archivo_mime, "tamano": tamano,
+                        "sha256": sha256, "url": j.archivo_url}}
+
+@app.get("/api/justificantes/{justificante_id}/archivo")
+def descargar_archivo_justificante(justificante_id: int, db: Session = Depends(get_db)):
+    """
+    Descarga con soporte de Range (visores de PDF, reanudar descargas). FileResponse envía
+    el archivo por bloques o con http.response.pathsend si el servidor lo soporta.
+    """
+    j = None
+    # Los justificantes de periodos archivados conservan su id en justificantes_archivo
+    for J in (models.Justificante, models.JustificanteArchivo):
+        j = db.query(J.archivo_sha256, J.archivo_nombre, J.archivo_mime).filter(J.id == justificante_id).first()
+        if j:
+            break
+    if not j or not j.archivo_sha256 or not ARCHIVOS.existe(j.archivo_sha256):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    # Solo PDF/PNG/JPEG se muestran en el navegador; cualquier otro tipo guardado antes
+    # (p. ej. un SVG con scripts) se descarga como binario y no se ejecuta en este origen
+    seguro = tipo_permitido(j.archivo_mime)
+    return FileResponse(
+        ARCHIVOS.ruta(j.archivo_sha256),
+        media_type=tipo_base(j.archivo_mime) if seguro else "application/octet-stream",
+        filename=j.archivo_nombre,
+        content_disposition_type="inline" if seguro else "attachment",
+        # El contenido de un hash nunca cambia: el ETag es el propio hash
+        headers={"ETag": f'"{j.archivo_sha256}"', "Cache-Control": "private, max-age=86400",
+                 "X-Content-Type-Options": "nosniff"},
+    )
+
 @app.get("/api/usuarios/{usuario_id}")
 def ver_usuario(usuario_id: int, db: Session = Depends(get_db)):
     u = db.query(models.Usuario).filter(models.Usuario.id == usuario_id).first()
@@ -539,20 +1462,16 @@ def ver_usuario(usuario_id: int, db: Session = Depends(get_db)):
     }
 
 # --------- Estado simple para la ESP32 ----------
-LAST_RESULT = {
-    "estado": "advertencia",
-    "mensaje": "Esperando QR"
-}
-
 @app.get("/api/resultado")
-def resultado_esp32():
+def resultado_esp32(db: Session = Depends(get_db)):
     """
     Devuelve el último resultado para la ESP32.
-    Nota: este estado es in-memory. Puedes actualizarlo desde otro proceso si lo necesitas.
+    Nota: se guarda en el almacén de estado (memoria o BD según ESTADO_BACKEND).
     """
+    resultado = ESTADO.obtener_resultado(db)
     return {
-        "estado": LAST_RESULT.get("estado", "advertencia"),
-        "mensaje": LAST_RESULT.get("mensaje", "Esperando QR")
+        "estado": resultado.get("estado", "advertencia"),
+        "mensaje": resultado.get("mensaje", "Esperando QR")
     }
 
 # (Opcional) Endpoint para actualizar manualmente el estado desde pruebas
@@ -561,13 +1480,15 @@ class ResultadoSet(BaseModel):
     mensaje: str | None = None
 
 @app.post("/api/resultado")
-def set_resultado_esp32(body: ResultadoSet):
+def set_resultado_esp32(body: ResultadoSet, db: Session = Depends(get_db)):
     """
     Permite fijar el estado que leerá la ESP32.
     No afecta la lógica de asistencias existente.
     """
-    LAST_RESULT["estado"] = body.estado
+    resultado = ESTADO.obtener_resultado(db)
+    resultado["estado"] = body.estado
     if body.mensaje is not None:
-        LAST_RESULT["mensaje"] = body.mensaje
-    return {"ok": True, "estado": LAST_RESULT}
-
+        resultado["mensaje"] = body.mensaje
+    ESTADO.fijar_resultado(db, resultado)
+    db.commit()
+    return {"ok": True, "estado": resultado}
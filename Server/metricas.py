@@ -0,0 +1,222 @@
+"""
+Métricas por ruta en formato de texto de Prometheus (GET /metrics).
+
+- MiddlewareMetricas (ASGI): cuenta peticiones por ruta y código de estado y guarda
+  un histograma de latencia. La ruta es la plantilla (/api/usuarios/{id}), no la URL,
+  para que las etiquetas no crezcan sin límite.
+- instrumentar(engine): eventos before/after_cursor_execute de SQLAlchemy que suman
+  consultas y tiempo de BD a la petición en curso (contextvar; llega también a
+  AsyncSession.run_sync y al threadpool). Un histograma de consultas por petición
+  deja ver los N+1: una ruta con p99 de 200 consultas salta a la vista.
+
+Las consultas fuera de una petición (escritor agrupado, archivado, snapshots) se
+cuentan con ruta="(fondo)". El escritor agrupado además informa el tamaño y la
+duración de cada lote (registrar_lote, observador de EscritorGrupal). Sin
+dependencias: el formato se escribe a mano.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+BUCKETS_LOTE = (1, 5, 10, 25, 50, 100, 200, 500)
+RUTA_FONDO = "(fondo)"
+RUTA_DESCONOCIDA = "(sin ruta)"
+EXCLUIDAS = ("/metrics",)
+
+_peticion = ContextVar("metricas_peticion", default=None)
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = {}        # (metodo, ruta, estado) -> n
+        self.latencias = {}         # (metodo, ruta) -> Histograma
+        self.consultas_peticion = {}  # (metodo, ruta) -> Histograma de consultas por petición
+        self.consultas = {}         # ruta -> n
+        self.segundos_bd = {}       # ruta -> segundos
+        self.en_curso = 0
+        self.lotes_escritura = Histograma(BUCKETS_LOTE)          # filas por lote del escritor agrupado
+        self.volcados_escritura = Histograma(BUCKETS_LATENCIA)  # segundos por volcado
+
+    def registrar_peticion(self, metodo, ruta, estado, segundos, consultas, segundos_bd):
+        """segundos=None para respuestas en flujo (SSE): se cuentan sin entrar al histograma."""
+        with self._lock:
+            clave = (metodo, ruta, str(estado))
+            self.peticiones[clave] = self.peticiones.get(clave, 0) + 1
+            if segundos is not None:
+                self.latencias.setdefault((metodo, ruta), Histograma(BUCKETS_LATENCIA)).observar(segundos)
+            self.consultas_peticion.setdefault((metodo, ruta), Histograma(BUCKETS_CONSULTAS)).observar(consultas)
+            self._sumar_bd(ruta, consultas, segundos_bd)
+
+    def registrar_consulta(self, ruta, segundos):
+        with self._lock:
+            self._sumar_bd(ruta, 1, segundos)
+
+    def registrar_lote(self, tamano, segundos):
+        """Observador de EscritorGrupal: se llama desde su hilo tras cada volcado."""
+        with self._lock:
+            self.lotes_escritura.observar(tamano)
+            self.volcados_escritura.observar(segundos)
+
+    def _sumar_bd(self, ruta, consultas, segundos):
+        if consultas:
+            self.consultas[ruta] = self.consultas.get(ruta, 0) + consultas
+            self.segundos_bd[ruta] = self.segundos_bd.get(ruta, 0.0) + segundos
+
+    def exponer(self):
+        """Texto de exposición de Prometheus (versión 0.0.4)."""
+        lineas = []
+        with self._lock:
+            _serie(lineas, "asistencia_http_peticiones_total", "counter", "Peticiones HTTP por ruta y código",
+                   [((("metodo", m), ("ruta", r), ("estado", e)), n) for (m, r, e), n in sorted(self.peticiones.items())])
+            _histogramas(lineas, "asistencia_http_duracion_segundos", "Latencia de las peticiones por ruta",
+                         self.latencias)
+            _histogramas(lineas, "asistencia_db_consultas_por_peticion", "Sentencias SQL por petición",
+                         self.consultas_peticion)
+            _serie(lineas, "asistencia_db_consultas_total", "counter", "Sentencias SQL ejecutadas por ruta",
+                   [((("ruta", r),), n) for r, n in sorted(self.consultas.items())])
+            _serie(lineas, "asistencia_db_segundos_total", "counter", "Tiempo en la BD por ruta",
+                   [((("ruta", r),), s) for r, s in sorted(self.segundos_bd.items())])
+            _serie(lineas, "asistencia_http_peticiones_en_curso", "gauge", "Peticiones atendiéndose ahora",
+                   [((), self.en_curso)])
+            _histograma(lineas, "asistencia_escritura_lote_filas", "Filas por lote del escritor agrupado",
+                        self.lotes_escritura)
+            _histograma(lineas, "asistencia_escritura_volcado_segundos", "Duración de cada lote del escritor agrupado",
+                        self.volcados_escritura)
+        return "\n".join(lineas) + "\n"
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ""
+    valores = ",".join(f'{k}="{_escapar(v)}"' for k, v in pares)
+    return "{" + valores + "}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _serie(lineas, nombre, tipo, ayuda, muestras):
+    lineas.append(f"# HELP {nombre} {ayuda}")
+    lineas.append(f"# TYPE {nombre} {tipo}")
+    for pares, valor in muestras:
+        lineas.append(f"{nombre}{_etiquetas(pares)} {_numero(valor)}")
+
+
+def _histogramas(lineas, nombre, ayuda, histogramas):
+    lineas.append(f"# HELP {nombre} {ayuda}")
+    lineas.append(f"# TYPE {nombre} histogram")
+    for (metodo, ruta), h in sorted(histogramas.items()):
+        _muestras_histograma(lineas, nombre, (("metodo", metodo), ("ruta", ruta)), h)
+
+
+def _histograma(lineas, nombre, ayuda, h):
+    """Histograma sin etiquetas."""
+    lineas.append(f"# HELP {nombre} {ayuda}")
+    lineas.append(f"# TYPE {nombre} histogram")
+    _muestras_histograma(lineas, nombre, (), h)
+
+
+def _muestras_histograma(lineas, nombre, base, h):
+    acumulado = 0
+    for limite, n in zip(h.buckets, h.conteos):
+        acumulado += n
+        lineas.append(f"{nombre}_bucket{_etiquetas(base + (('le', _numero(limite)),))} {acumulado}")
+    lineas.append(f"{nombre}_bucket{_etiquetas(base + (('le', '+Inf'),))} {h.total}")
+    lineas.append(f"{nombre}_sum{_etiquetas(base)} {_numero(h.suma)}")
+    lineas.append(f"{nombre}_count{_etiquetas(base)} {h.total}")
+
+
+METRICAS = Metricas()
+
+
+#----------------- CONSULTAS SQL ------------------
+class _Peticion:
+    __slots__ = ("consultas", "segundos_bd")
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_bd = 0.0
+
+
+# El inicio se guarda en el contexto de ejecución: si la sentencia falla no queda colgado
+def _antes(conn, cursor, sentencia, parametros, contexto, executemany):
+    contexto._metricas_inicio = time.perf_counter()
+
+
+def _despues(conn, cursor, sentencia, parametros, contexto, executemany):
+    segundos = time.perf_counter() - contexto._metricas_inicio
+    peticion = _peticion.get()
+    if peticion is None:
+        METRICAS.registrar_consulta(RUTA_FONDO, segundos)
+        return
+    peticion.consultas += 1
+    peticion.segundos_bd += segundos
+
+
+def instrumentar(engine):
+    """Registra los eventos de cursor en un Engine (o en el sync_engine de un AsyncEngine)."""
+    motor = getattr(engine, "sync_engine", engine)
+    event.listen(motor, "before_cursor_execute", _antes)
+    event.listen(motor, "after_cursor_execute", _despues)
+
+
+#----------------- MIDDLEWARE ------------------
+class MiddlewareMetricas:
+    """Mide cada petición HTTP hasta el último fragmento de la respuesta."""
+
+    def __init__(self, app, metricas=METRICAS):
+        self.app = app
+        self.metricas = metricas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXCLUIDAS:
+            return await self.app(scope, receive, send)
+
+        peticion = _Peticion()
+        token = _peticion.set(peticion)
+        inicio = time.perf_counter()
+        estado = 500
+        flujo = False  # SSE: la conexión dura lo que el cliente quiera, no es latencia
+
+        async def enviar(mensaje):
+            nonlocal estado, flujo
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                flujo = any(k == b"content-type" and v.startswith(b"text/event-stream")
+                            for k, v in mensaje.get("headers", ()))
+            await send(mensaje)
+
+        self.metricas.en_curso += 1
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            self.metricas.en_curso -= 1
+            _peticion.reset(token)
+            # El router de Starlette deja la ruta encontrada en el scope
+            ruta = getattr(scope.get("route"), "path", RUTA_DESCONOCIDA)
+            segundos = None if flujo else time.perf_counter() - inicio
+            self.metricas.registrar_peticion(scope["method"], ruta, estado, segundos,
+                                             peticion.consultas, peticion.segundos_bd)
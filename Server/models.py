@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum, Text, Time, Date, ForeignKey, SmallInteger
+from sqlalchemy import Index, UniqueConstraint, Column, Integer, String, DateTime, Boolean, Enum, Text, Time, Date, ForeignKey, SmallInteger
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -46,6 +46,12 @@ class Asistencia(Base):  # NOTA: Se llama "Asistencia" no "Registro"
     usuario = relationship("Usuario")
     aula = relationship("Aula")
 
+    __table_args__ = (
+        # Una entrada y una salida por usuario y día; también sirve de índice (usuario_id, fecha)
+        UniqueConstraint("usuario_id", "fecha", "tipo", name="uq_usuario_fecha_tipo"),
+        Index("idx_fecha", "fecha"),
+    )
+
 class Justificante(Base):
     __tablename__ = "justificantes"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -58,4 +64,77 @@ class Justificante(Base):
     archivo_nombre = Column(String(200))
     archivo_url = Column(String(500))
     archivo_mime = Column(String(50))
-    created_at = Column(DateTime, default=datetime.now)
\ No newline at end of file
+    archivo_sha256 = Column(String(64), index=True)  # clave en el almacén de archivos (archivos.py)
+    created_at = Column(DateTime, default=datetime.now)
+
+class AsistenciaArchivo(Base):
+    """Asistencias de periodos cerrados (ver archivado.py). Mismas columnas, sin claves foráneas."""
+    __tablename__ = "asistencias_archivo"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # conserva el id original
+    usuario_id = Column(Integer, nullable=False)
+    rol = Column(Enum('Estudiante', 'Docente'), nullable=False)
+    curso = Column(String(20))
+    aula_id = Column(Integer)
+    tipo = Column(Enum('Entrada', 'Salida'), nullable=False)
+    fecha = Column(Date, nullable=False)
+    hora = Column(Time, nullable=False)
+    estado = Column(Enum('A tiempo', 'Tarde', 'Ausente', 'Justificado', 'Cumplió horario'), nullable=False)
+    device_id = Column(String(50))
+    created_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("idx_archivo_fecha", "fecha"),
+        Index("idx_archivo_usuario_fecha", "usuario_id", "fecha"),
+        {"mysql_row_format": "COMPRESSED"},
+    )
+
+class JustificanteArchivo(Base):
+    """Justificantes de las asistencias archivadas."""
+    __tablename__ = "justificantes_archivo"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    asistencia_id = Column(Integer, nullable=False, index=True)
+    usuario_id = Column(Integer, nullable=False)
+    fecha_registro = Column(Date, nullable=False)
+    fecha_documento = Column(Date, nullable=False)
+    motivo = Column(Text, nullable=False)
+    referencia = Column(String(50))
+    archivo_nombre = Column(String(200))
+    archivo_url = Column(String(500))
+    archivo_mime = Column(String(50))
+    archivo_sha256 = Column(String(64), index=True)
+    created_at = Column(DateTime)
+
+    __table_args__ = ({"mysql_row_format": "COMPRESSED"},)
+
+class ContadorDiario(Base):
+    """Contadores del día por aula y rol, actualizados al escribir asistencias (ver contadores.py)."""
+    __tablename__ = "contadores_diarios"
+
+    fecha = Column(Date, primary_key=True)
+    aula_id = Column(Integer, primary_key=True, default=0)  # 0 = sin aula asignada
+    rol = Column(Enum('Estudiante', 'Docente'), primary_key=True)
+    entradas = Column(Integer, nullable=False, default=0)
+    salidas = Column(Integer, nullable=False, default=0)
+    a_tiempo = Column(Integer, nullable=False, default=0)
+
+
+class ResumenAsistencia(Base):
+    """Asistencias por día, aula, grupo, rol y estado para los reportes (ver contadores.py)."""
+    __tablename__ = "asistencias_resumen"
+
+    fecha = Column(Date, primary_key=True)
+    aula_id = Column(Integer, primary_key=True, default=0)    # 0 = sin aula asignada
+    grupo = Column(String(20), primary_key=True, default="")  # "" = usuario sin grupo
+    rol = Column(Enum('Estudiante', 'Docente'), primary_key=True)
+    estado = Column(Enum('A tiempo', 'Tarde', 'Ausente', 'Justificado', 'Cumplió horario'), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+
+class EstadoCompartido(Base):
+    """Estado clave/valor compartido entre workers (ventanas de marcaje, último resultado ESP32)."""
+    __tablename__ = "estado_compartido"
+
+    clave = Column(String(50), primary_key=True)
+    valor = Column(Text, nullable=False)   # JSON
+    expira = Column(DateTime, index=True)  # NULL = no caduca
@@ -0,0 +1,74 @@
+"""
+Planificador de tareas periódicas dentro de la app, fuera del camino de las peticiones.
+
+Un hilo ejecuta cada PLANIFICADOR_SEG las tareas registradas, cada una con su propia
+sesión y su propio commit. Un error en una tarea se guarda en su estado y no detiene
+las demás ni el hilo. Lo usa main.py para cerrar las ventanas de marcaje vencidas
+(ausentes por lotes) y purgar el estado caducado.
+
+Con varios workers cada uno tiene su planificador; las tareas deben ser idempotentes
+(las de main.py lo son: la clave única descarta ausentes repetidos).
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+PLANIFICADOR_SEG = float(os.getenv("PLANIFICADOR_SEG", "30"))
+
+
+class Planificador:
+    def __init__(self, fabrica_sesion, intervalo=PLANIFICADOR_SEG):
+        self.fabrica_sesion = fabrica_sesion
+        self.intervalo = intervalo
+        self._tareas = []  # (nombre, fn(db) -> resultado)
+        self._detener = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.estados = {}
+
+    def agregar(self, nombre, fn):
+        """fn(db) hace su propio commit y devuelve un resumen (se muestra en estado())."""
+        self._tareas.append((nombre, fn))
+        self.estados[nombre] = {"ejecuciones": 0, "errores": 0, "ultimo": None, "ultimo_error": None,
+                                "duracion_ms": None, "hora": None}
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._detener.clear()
+                self._hilo = threading.Thread(target=self._bucle, name="planificador", daemon=True)
+                self._hilo.start()
+
+    def detener(self):
+        """Espera a que termine la pasada en curso (al apagar la app)."""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            self._detener.set()
+            hilo.join()
+
+    def ejecutar_pasada(self):
+        for nombre, fn in self._tareas:
+            estado = self.estados[nombre]
+            inicio = time.perf_counter()
+            db = self.fabrica_sesion()
+            try:
+                estado["ultimo"] = fn(db)
+            except Exception as e:
+                db.rollback()
+                estado["errores"] += 1
+                estado["ultimo_error"] = str(e)
+            finally:
+                db.close()
+            estado["ejecuciones"] += 1
+            estado["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+            estado["hora"] = datetime.now().isoformat(timespec="seconds")
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            self.ejecutar_pasada()
+
+    def estado(self):
+        return {"activo": self._hilo is not None, "intervalo_seg": self.intervalo,
+                "tareas": {k: dict(v) for k, v in self.estados.items()}}
@@ -0,0 +1,201 @@
+"""
+Snapshots columnares (Parquet) de las asistencias para análisis fuera de línea.
+
+Escribe una partición por día, estilo Hive, que pandas/polars/duckdb leen como un
+solo dataset:
+
+    snapshots/asistencias/fecha=2025-03-10/asistencias.parquet
+
+    pyarrow.dataset.dataset("snapshots/asistencias", partitioning="hive")
+    pandas.read_parquet("snapshots/asistencias")
+
+La fecha va en el nombre de la carpeta (no se repite dentro del archivo).
+
+Solo se exportan los días completos (anteriores a hoy) posteriores a la última
+partición; `rehacer_desde` vuelve a escribir los días a partir de esa fecha (p. ej.
+tras cargar justificantes atrasados). Requiere pyarrow (pip install pyarrow).
+
+Uso desde PROYECTOSOF8/Server/:
+
+    py snapshots.py [--rehacer-desde 2025-03-01]
+"""
+import os
+import threading
+import time
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+import models
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dependencia opcional
+    pa = pq = None
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+SNAPSHOT_LOTE = 5000  # filas por lote del cursor del servidor
+
+_DIR_ASISTENCIAS = "asistencias"
+
+
+def _esquema():
+    # Categóricas (dictionary) para las columnas de pocos valores; enteros de 32 bits
+    categoria = pa.dictionary(pa.int8(), pa.string())
+    return pa.schema([
+        ("id", pa.int32()),
+        ("usuario_id", pa.int32()),
+        ("cedula", pa.string()),
+        ("nombre", pa.string()),
+        ("grupo", pa.dictionary(pa.int16(), pa.string())),
+        ("rol", categoria),
+        ("aula_id", pa.int32()),
+        ("aula", pa.dictionary(pa.int16(), pa.string())),
+        ("tipo", categoria),
+        ("hora", pa.time32("s")),
+        ("estado", categoria),
+        ("device_id", pa.string()),
+    ])
+
+
+def disponible():
+    return pa is not None
+
+
+def _carpeta(fecha):
+    return os.path.join(SNAPSHOT_DIR, _DIR_ASISTENCIAS, f"fecha={fecha.isoformat()}")
+
+
+def particiones():
+    """Fechas que ya tienen partición escrita."""
+    raiz = os.path.join(SNAPSHOT_DIR, _DIR_ASISTENCIAS)
+    if not os.path.isdir(raiz):
+        return []
+    fechas = []
+    for nombre in os.listdir(raiz):
+        if nombre.startswith("fecha=") and os.path.exists(os.path.join(raiz, nombre, "asistencias.parquet")):
+            fechas.append(date.fromisoformat(nombre[len("fecha="):]))
+    return sorted(fechas)
+
+
+def _escribir_particion(fecha, filas, esquema):
+    columnas = {campo.name: [f[campo.name] for f in filas] for campo in esquema}
+    tabla = pa.table(columnas, schema=esquema)
+    carpeta = _carpeta(fecha)
+    os.makedirs(carpeta, exist_ok=True)
+    destino = os.path.join(carpeta, "asistencias.parquet")
+    # Se escribe aparte y se renombra: un lector nunca ve una partición a medias
+    # (los lectores de datasets ignoran los archivos que empiezan con ".")
+    temporal = os.path.join(carpeta, ".asistencias.parquet.tmp")
+    pq.write_table(tabla, temporal, compression="zstd")
+    os.replace(temporal, destino)
+
+
+def exportar(db: Session, rehacer_desde=None, hasta=None):
+    """
+    Exporta los días posteriores a la última partición (o desde `rehacer_desde`)
+    hasta `hasta`, por defecto ayer, y devuelve un resumen.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow no está instalado (pip install pyarrow)")
+    inicio = time.perf_counter()
+    hasta = hasta or date.fromordinal(date.today().toordinal() - 1)
+
+    desde = rehacer_desde
+    if desde is None and (hechas := particiones()):
+        desde = date.fromordinal(hechas[-1].toordinal() + 1)
+
+    esquema = _esquema()
+    escritas, filas_total = [], 0
+    actual, filas = None, []
+    # Periodos archivados primero (archivado.py mueve meses completos, un día nunca queda
+    # repartido entre las dos tablas), luego la tabla activa
+    for A in (models.AsistenciaArchivo, models.Asistencia):
+        U, Au = models.Usuario, models.Aula
+        q = (
+            db.query(A.id, A.usuario_id, U.cedula, U.nombre, U.grupo, A.rol, A.aula_id, Au.aula,
+                     A.tipo, A.fecha, A.hora, A.estado, A.device_id)
+            .join(U, A.usuario_id == U.id)
+            .outerjoin(Au, A.aula_id == Au.id)
+            .filter(A.fecha <= hasta)
+        )
+        # Incremental: solo los días nuevos; el índice por fecha evita leer el historial ya exportado
+        if desde is not None:
+            q = q.filter(A.fecha >= desde)
+        for fila in q.order_by(A.fecha, A.id).yield_per(SNAPSHOT_LOTE):
+            if fila.fecha != actual:
+                if filas:
+                    _escribir_particion(actual, filas, esquema)
+                    escritas.append(actual)
+                    filas_total += len(filas)
+                actual, filas = fila.fecha, []
+            filas.append(fila._mapping)
+    if filas:
+        _escribir_particion(actual, filas, esquema)
+        escritas.append(actual)
+        filas_total += len(filas)
+
+    return {
+        "dias_escritos": len(escritas),
+        "filas": filas_total,
+        "desde": str(escritas[0]) if escritas else None,
+        "hasta": str(escritas[-1]) if escritas else None,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "ruta": os.path.join(SNAPSHOT_DIR, _DIR_ASISTENCIAS),
+    }
+
+
+class TrabajoSnapshot:
+    """Una sola exportación a la vez; guarda el estado de la última para consultarlo."""
+
+    def __init__(self, fabrica_sesion):
+        self.fabrica_sesion = fabrica_sesion
+        self._lock = threading.Lock()
+        self.en_curso = False
+        self.ultimo = None
+
+    def iniciar(self):
+        """Marca el trabajo como en curso; False si ya había uno."""
+        with self._lock:
+            if self.en_curso:
+                return False
+            self.en_curso = True
+            return True
+
+    def ejecutar(self, rehacer_desde=None):
+        db = self.fabrica_sesion()
+        try:
+            resultado = {"ok": True, **exportar(db, rehacer_desde)}
+        except Exception as e:
+            resultado = {"ok": False, "error": str(e)}
+        finally:
+            db.close()
+        self.ultimo = {**resultado, "terminado": datetime.now().isoformat(timespec="seconds")}
+        with self._lock:
+            self.en_curso = False
+        return self.ultimo
+
+    def estado(self):
+        fechas = particiones()
+        return {
+            "disponible": disponible(),
+            "en_curso": self.en_curso,
+            "ultimo": self.ultimo,
+            "particiones": len(fechas),
+            "primera": str(fechas[0]) if fechas else None,
+            "ultima": str(fechas[-1]) if fechas else None,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Exporta las asistencias a Parquet por día")
+    parser.add_argument("--rehacer-desde", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        r = exportar(db, args.rehacer_desde)
+    finally:
+        db.close()
+    print(f"✅ {r['dias_escritos']} días ({r['filas']} filas) en {r['ruta']} ({r['segundos']}s)")
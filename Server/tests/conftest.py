@@ -0,0 +1,22 @@
+"""
+Pruebas contra una BD SQLite temporal (py -m pytest desde PROYECTOSOF8/Server/).
+
+El entorno se fija antes de importar la app: database.py lo lee al importarse.
+"""
+import os
+import sys
+import tempfile
+
+SERVER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER)
+
+_TMP = tempfile.mkdtemp(prefix="asistencias_pruebas_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'pruebas.db')}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_TMP, 'pruebas.db')}"
+os.environ["ARCHIVOS_DIR"] = os.path.join(_TMP, "archivos")
+os.environ["ESQUEMA_CACHE"] = os.path.join(_TMP, ".esquema")
+os.environ["SNAPSHOT_DIR"] = os.path.join(_TMP, "snapshots")
+
+from benchmark import sqlite_local  # noqa: E402
+
+sqlite_local.aplicar()
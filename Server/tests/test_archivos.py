@@ -0,0 +1,50 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import main
+import models
+from benchmark import fixtures
+
+PDF = b"%PDF-1.4\n" + b"0" * 20000  # supera el minimum_size de gzip
+
+
+@pytest.fixture(scope="module")
+def cliente():
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="module")
+def justificante(cliente):
+    db = database.SessionLocal()
+    try:
+        fixtures.generar(db, 5, 2)
+        a = db.query(models.Asistencia).first()
+    finally:
+        db.close()
+    r = cliente.post("/api/justificantes", json={
+        "asistencia_id": a.id, "usuario_id": a.usuario_id, "fecha_registro": str(a.fecha),
+        "fecha_documento": str(a.fecha), "motivo": "prueba"})
+    return r.json()["justificante"]["id"]
+
+
+def test_descarga_sin_gzip_y_con_content_length(cliente, justificante):
+    r = cliente.post(f"/api/justificantes/{justificante}/archivo",
+                     files={"archivo": ("c.pdf", io.BytesIO(PDF), "application/pdf")})
+    assert r.status_code == 200
+    r = cliente.get(f"/api/justificantes/{justificante}/archivo", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert "content-encoding" not in r.headers
+    assert r.headers["content-length"] == str(len(PDF))
+    assert r.headers["x-content-type-options"] == "nosniff"
+    assert r.content == PDF
+
+
+def test_svg_rechazado(cliente, justificante):
+    svg = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+    r = cliente.post(f"/api/justificantes/{justificante}/archivo",
+                     files={"archivo": ("x.svg", io.BytesIO(svg), "image/svg+xml")})
+    assert r.status_code == 415
@@ -0,0 +1,18 @@
+import credenciales
+
+
+def test_token_valido():
+    token = credenciales.emitir_token({"id": 7, "rol": "Docente"})
+    assert credenciales.validar_token(token)["id"] == 7
+
+
+def test_firma_no_ascii_no_lanza():
+    assert credenciales.validar_token("abc.é") is None
+    assert credenciales.validar_token("é.é") is None
+
+
+def test_tokens_invalidos_no_entran_en_cache():
+    antes = credenciales.CACHE_SESIONES.estadisticas()["tamano"]
+    for i in range(50):
+        assert credenciales.validar_token(f"basura{i}.firma") is None
+    assert credenciales.CACHE_SESIONES.estadisticas()["tamano"] == antes
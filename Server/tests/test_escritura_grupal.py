@@ -0,0 +1,29 @@
+from sqlalchemy import insert
+
+import database
+import models
+from escritura_grupal import EscritorGrupal
+
+
+def test_fallo_de_al_confirmar_no_anula_filas_guardadas():
+    database.Base.metadata.create_all(bind=database.engine)
+
+    def escribir(db, filas):
+        db.execute(insert(models.EstadoCompartido), filas)
+        return list(range(len(filas)))
+
+    def al_confirmar(db):
+        raise RuntimeError("fallo tras el commit")
+
+    escritor = EscritorGrupal(database.SessionLocal, escribir, al_confirmar=al_confirmar)
+    try:
+        futuro = escritor.enviar({"clave": "prueba:al_confirmar", "valor": "1", "expira": None})
+        assert futuro.result(timeout=5) == 0
+        assert escritor.estadisticas()["errores_al_confirmar"] == 1
+    finally:
+        escritor.detener()
+    db = database.SessionLocal()
+    try:
+        assert db.query(models.EstadoCompartido).filter_by(clave="prueba:al_confirmar").count() == 1
+    finally:
+        db.close()
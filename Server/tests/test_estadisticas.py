@@ -0,0 +1,18 @@
+from benchmark.estadisticas import percentil
+
+VEINTE = list(range(1, 21))  # 1..20
+
+
+def test_rango_mas_cercano():
+    assert percentil(VEINTE, 95) == 19  # no el máximo
+    assert percentil(VEINTE, 50) == 10
+    assert percentil(VEINTE, 99) == 20
+    assert percentil(VEINTE, 100) == 20
+    assert percentil(VEINTE, 5) == 1
+    assert percentil(VEINTE, 0) == 1
+
+
+def test_casos_borde():
+    assert percentil([], 95) == 0.0
+    assert percentil([3.5], 50) == 3.5
+    assert percentil([1, 2, 3, 4, 5], 50) == 3
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import main
+import models
+from benchmark import fixtures
+
+
+@pytest.fixture(scope="module")
+def cliente():
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="module")
+def usuario_id(cliente):
+    db = database.SessionLocal()
+    try:
+        if not db.query(models.Usuario).count():
+            fixtures.generar(db, 5, 10)
+        return db.query(models.Usuario.id).filter(models.Usuario.rol == "Estudiante").first()[0]
+    finally:
+        db.close()
+
+
+def test_referencia_larga_es_422(cliente, usuario_id):
+    r = cliente.post("/api/justificantes/lote", json={
+        "usuario_id": usuario_id, "desde": str(date.today() - timedelta(days=10)), "hasta": str(date.today()),
+        "motivo": "m", "referencia": "x" * 51})
+    assert r.status_code == 422
+
+
+def test_omitidas_con_motivo(cliente, usuario_id):
+    desde, hasta = date.today() - timedelta(days=10), date.today()
+    db = database.SessionLocal()
+    try:
+        A = models.Asistencia
+        en_rango = db.query(A.id, A.estado).filter(
+            A.usuario_id == usuario_id, A.fecha >= desde, A.fecha <= hasta).all()
+    finally:
+        db.close()
+    r = cliente.post("/api/justificantes/lote", json={
+        "usuario_id": usuario_id, "desde": str(desde), "hasta": str(hasta), "motivo": "m", "referencia": "R-1"})
+    assert r.status_code == 200
+    datos = r.json()
+    justificables = {id_ for id_, estado in en_rango if estado in main.ESTADOS_JUSTIFICABLES}
+    assert {j["asistencia_id"] for j in datos["justificantes"]} == justificables
+    assert {o["asistencia_id"] for o in datos["omitidas"]} == {id_ for id_, _ in en_rango} - justificables
+    assert all("no justificable" in o["motivo"] for o in datos["omitidas"])
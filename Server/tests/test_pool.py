@@ -0,0 +1,46 @@
+import os
+import tempfile
+import time
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as TimeoutPool
+from sqlalchemy.pool import QueuePool
+
+import database
+
+
+def _motor(monkeypatch, **config):
+    for nombre, valor in config.items():
+        monkeypatch.setattr(database, nombre, valor)
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pool.db')}"
+    return database._crear_motor(create_engine, url, QueuePool)
+
+
+def test_connect_lento_no_cuenta_como_espera(monkeypatch):
+    motor, estadisticas = _motor(monkeypatch, DB_POOL_SIZE=2, DB_MAX_OVERFLOW=0)
+    event.listen(motor, "do_connect", lambda *a: time.sleep(0.05))
+    with motor.connect() as conexion:
+        conexion.execute(text("SELECT 1"))
+    resumen = estadisticas.resumen(motor.pool)
+    assert resumen["conexiones_creadas"] == 1
+    assert resumen["conexion_max_ms"] >= 50
+    assert resumen["espera_max_ms"] < 50
+    assert resumen["timeouts"] == 0
+
+
+def test_solo_el_timeout_del_pool_cuenta_como_timeout(monkeypatch):
+    motor, estadisticas = _motor(monkeypatch, DB_POOL_SIZE=1, DB_MAX_OVERFLOW=0, DB_POOL_TIMEOUT=0.1)
+    with motor.connect():
+        with pytest.raises(TimeoutPool):
+            motor.connect()
+    assert estadisticas.timeouts == 1
+
+    def fallar(*a):
+        raise RuntimeError("sin servidor")
+
+    motor.pool.dispose()
+    event.listen(motor, "do_connect", fallar)
+    with pytest.raises(RuntimeError):
+        motor.connect()
+    assert estadisticas.timeouts == 1
@@ -1,9 +1,18 @@
 import cv2
 from pyzbar.pyzbar import decode
 import requests
+import json
+import os
+from datetime import datetime
 
 API_URL = "http://10.92.255.218:8000/api/asistencias/qr"  # Cambia por la IP de tu PC
+API_URL_LOTE = "http://10.92.255.218:8000/api/asistencias/qr/batch"
 API_RESULTADO = "http://10.92.255.218:8000/api/resultado"
+DEVICE_ID = "pc-escaner"
+PENDIENTES = "pendientes_qr.json"  # QR leídos sin conexión, se envían en lote al reconectar
+RECHAZADOS = "rechazados_qr.json"  # pendientes que el backend no aceptó (para revisarlos a mano)
+# Solo esto es "sin conexión"; un error HTTP del backend no debe encolar los QR nuevos
+SIN_CONEXION = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
 
 def escanear_qr():
     cap = cv2.VideoCapture(0)
@@ -35,14 +44,67 @@ def escanear_qr():
     cv2.destroyAllWindows()
     return qr_detectado
 
-def enviar_qr_al_backend(qr_text):
-    if qr_text:
-        res = requests.post(API_URL, json={"qr_texto": qr_text})
-        print("Respuesta del backend:")
-        print("Código de estado:", res.status_code)
-        print("Texto de respuesta:", res.text)
+def cargar_pendientes():
+    if not os.path.exists(PENDIENTES):
+        return []
+    with open(PENDIENTES) as f:
+        return json.load(f)
+
+def guardar_pendientes(pendientes):
+    with open(PENDIENTES, "w") as f:
+        json.dump(pendientes, f)
+
+def registrar_rechazados(items):
+    rechazados = []
+    if os.path.exists(RECHAZADOS):
+        with open(RECHAZADOS) as f:
+            rechazados = json.load(f)
+    with open(RECHAZADOS, "w") as f:
+        json.dump(rechazados + items, f)
+
+def enviar_pendientes():
+    """
+    Envía en un solo POST los QR guardados mientras no había conexión.
+    Lanza SIN_CONEXION si el backend no responde (los pendientes se conservan).
+    """
+    pendientes = cargar_pendientes()
+    if not pendientes:
+        return
+    res = requests.post(API_URL_LOTE, json=pendientes, timeout=10)
+    if res.status_code >= 500:
+        print(f"Error del servidor al enviar pendientes ({res.status_code}), se reintentará luego")
+        return
+    if not res.ok:
+        # 4xx: el lote no se aceptará nunca; se aparta para no bloquear los QR nuevos
+        print(f"Pendientes rechazados por el backend ({res.status_code}): {res.text}")
+        registrar_rechazados([{**p, "detalle": res.text} for p in pendientes])
     else:
+        datos = res.json()
+        print(f"Pendientes enviados: {datos['registrados']} registrados, {datos['rechazados']} rechazados")
+        rechazados = [{**p, "detalle": r.get("detail")} for p, r in zip(pendientes, datos["resultados"]) if not r["ok"]]
+        if rechazados:
+            registrar_rechazados(rechazados)
+    os.remove(PENDIENTES)
+
+def enviar_qr_al_backend(qr_text):
+    if not qr_text:
         print("No se detectó ningún QR.")
+        return False
+    item = {"qr_texto": qr_text, "scanned_at": datetime.now().isoformat(), "device_id": DEVICE_ID}
+    try:
+        enviar_pendientes()
+        res = requests.post(API_URL, json={"qr_texto": qr_text}, timeout=5)
+    except SIN_CONEXION as e:
+        print("Sin conexión, QR guardado para enviar luego:", e)
+        guardar_pendientes(cargar_pendientes() + [item])
+        return False
+    except requests.exceptions.RequestException as e:
+        print("Error al enviar el QR:", e)
+        return False
+    print("Respuesta del backend:")
+    print("Código de estado:", res.status_code)
+    print("Texto de respuesta:", res.text)
+    return res.ok
 
 def notificar_esp32_exito():
     # Cambia el estado para que la ESP32 encienda la LED verde
@@ -50,7 +112,6 @@ def notificar_esp32_exito():
 
 if __name__ == "__main__":
     qr_text = escanear_qr()
-    enviar_qr_al_backend(qr_text)
-    if qr_text:
+    if enviar_qr_al_backend(qr_text):
         print("QR registrado")
         notificar_esp32_exito()
\ No newline at end of file